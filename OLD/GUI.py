@@ -1,30 +1,36 @@
+import asyncio
 import random
 import time
 import threading
-from queue import Queue
-from collections import defaultdict
+from collections import defaultdict, deque
 import tkinter as tk
 from tkinter import ttk, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+LOG_LINES = 500  # lines kept in the activity log
+FRAME_MS = 33  # the log is redrawn about 30 times a second
+
 
 class WarehouseSimulation:
     def __init__(self, gui_update_callback=None):
         # Initialize simulation parameters
         self.num_employees_per_stage = {'availability': 2, 'packaging': 3, 'shipping': 2}
         self.available_items = set(random.sample(range(1000, 5000), 100))
-        self.stage_queues = {
-            'availability': Queue(),
-            'packaging': Queue(),
-            'shipping': Queue()
-        }
-        self.completed_orders = []
+        self.stage_queues = {}
         self.lock = threading.Lock()
+        self.reset_stats()
         self.running = False
         self.order_counter = 1
         self.gui_update_callback = gui_update_callback
         self.employees = []
+        # Time compression: 1 plays the simulation live, 1000 a thousand times faster
+        self.speed = 1.0
+        # Every employee is a coroutine on one event loop, run by one thread
+        self.loop = None
+        self.thread = None
+        self._stop_event = None
+        self._started = 0
 
     def configure(self, employees_config):
         """Configure the simulation with new employee counts"""
@@ -32,45 +38,80 @@ class WarehouseSimulation:
         self.stop()  # Stop current simulation if running
         self.employees = []  # Clear existing employees
 
+    def reset_stats(self):
+        """Running totals, updated as each order finishes so reading them is O(1)"""
+        with self.lock:
+            self.completed_count = 0
+            self.failed_count = 0
+            self.processing_time_sum = 0.0
+            self.stage_time_sums = {'availability': 0.0, 'packaging': 0.0, 'shipping': 0.0}
+            self.first_created = None  # creation time of the first order to complete
+            self.last_completed = None
+
+    def record_finished(self, order):
+        """Add a completed order to the running totals; call with self.lock held"""
+        timestamps = order['timestamps']
+        if self.first_created is None:
+            self.first_created = timestamps['created']
+        self.last_completed = timestamps['completed']
+        self.completed_count += 1
+        self.processing_time_sum += timestamps['completed'] - timestamps['created']
+        self.stage_time_sums['availability'] += timestamps['packaging_start'] - timestamps['availability_start']
+        self.stage_time_sums['packaging'] += timestamps['shipping_start'] - timestamps['packaging_start']
+        self.stage_time_sums['shipping'] += timestamps['completed'] - timestamps['shipping_start']
+
+    def clock(self):
+        """Simulated seconds since the start, i.e. wall time scaled by the speed."""
+        return (time.monotonic() - self._started) * self.speed
+
     def start(self):
         """Start the simulation"""
         if self.running:
             return
 
         self.running = True
-        self.completed_orders = []
+        self.reset_stats()
         self.order_counter = 1
 
-        # Create employee threads for each stage
-        for stage, count in self.num_employees_per_stage.items():
-            for i in range(count):
-                employee = threading.Thread(target=self.process_stage, args=(stage,))
-                employee.daemon = True
-                self.employees.append(employee)
-
-        # Start threads
-        threading.Thread(target=self.generate_orders, daemon=True).start()
-        for employee in self.employees:
-            employee.start()
+        self._started = time.monotonic()
+        self._stop_event = asyncio.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.run_employees(),), daemon=True)
+        self.thread.start()
 
         if self.gui_update_callback:
             self.gui_update_callback("started")
 
+    async def run_employees(self):
+        """Run the order generator and one coroutine per employee until stopped"""
+        self.stage_queues = {stage: asyncio.Queue() for stage in ('availability', 'packaging', 'shipping')}
+        self.employees = [asyncio.create_task(self.generate_orders())]
+        for stage, count in self.num_employees_per_stage.items():
+            for i in range(count):
+                self.employees.append(asyncio.create_task(self.process_stage(stage)))
+        await self._stop_event.wait()
+        # Cancelling wakes every employee right away, wherever it is waiting
+        for employee in self.employees:
+            employee.cancel()
+        await asyncio.gather(*self.employees, return_exceptions=True)
+
     def stop(self):
         """Stop the simulation"""
         self.running = False
-        for employee in self.employees:
-            if employee.is_alive():
-                employee.join(timeout=1)
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+            self.thread.join()
+            self.loop.close()
+            self.thread = None
         self.employees = []
 
         if self.gui_update_callback:
             self.gui_update_callback("stopped")
 
-    def generate_orders(self):
+    async def generate_orders(self):
         """Generate random orders with random intervals"""
         while self.running:
-            time.sleep(random.uniform(0.1, 2))
+            await asyncio.sleep(random.uniform(0.1, 2) / self.speed)
 
             num_items = random.randint(1, 5)
             items = [random.randint(1000, 5000) for _ in range(num_items)]
@@ -84,7 +125,7 @@ class WarehouseSimulation:
                 'items': items,
                 'status': 'created',
                 'timestamps': {
-                    'created': time.time(),
+                    'created': self.clock(),
                     'availability_start': None,
                     'packaging_start': None,
                     'shipping_start': None,
@@ -92,97 +133,98 @@ class WarehouseSimulation:
                 }
             }
 
-            self.stage_queues['availability'].put(order)
+            self.stage_queues['availability'].put_nowait(order)
 
             if self.gui_update_callback:
                 self.gui_update_callback("order_created", order_id)
 
-    def process_stage(self, stage):
+    async def process_stage(self, stage):
         """Process orders in a specific stage"""
         while self.running:
             try:
-                order = self.stage_queues[stage].get(timeout=1)
+                order = await self.stage_queues[stage].get()
 
                 with self.lock:
                     order['status'] = f'in_{stage}'
-                    order['timestamps'][f'{stage}_start'] = time.time()
+                    order['timestamps'][f'{stage}_start'] = self.clock()
                     if self.gui_update_callback:
                         self.gui_update_callback("stage_started", order['id'], stage)
 
                 processing_time = random.uniform(0.5, 3)
-                time.sleep(processing_time)
+                await asyncio.sleep(processing_time / self.speed)
 
                 if stage == 'availability':
                     unavailable_items = [item for item in order['items'] if item not in self.available_items]
                     if unavailable_items:
                         with self.lock:
                             order['status'] = 'failed'
-                            order['timestamps']['completed'] = time.time()
+                            order['timestamps']['completed'] = self.clock()
+                            # Counted, but kept out of the time sums and the throughput window
+                            self.failed_count += 1
                             if self.gui_update_callback:
                                 self.gui_update_callback("order_failed", order['id'], unavailable_items)
                         continue
 
-                    self.stage_queues['packaging'].put(order)
+                    self.stage_queues['packaging'].put_nowait(order)
                 elif stage == 'packaging':
-                    self.stage_queues['shipping'].put(order)
+                    self.stage_queues['shipping'].put_nowait(order)
                 elif stage == 'shipping':
                     with self.lock:
                         order['status'] = 'completed'
-                        order['timestamps']['completed'] = time.time()
-                        self.completed_orders.append(order)
+                        order['timestamps']['completed'] = self.clock()
+                        self.record_finished(order)
                         if self.gui_update_callback:
                             self.gui_update_callback("order_completed", order['id'])
 
-            except:
+            except asyncio.CancelledError:
+                raise
+            except Exception:
                 continue
 
     def get_stats(self):
         """Calculate and return simulation statistics"""
+        # Copy the running totals under the lock, derive the rest outside it
         with self.lock:
-            completed = [o for o in self.completed_orders if o['status'] == 'completed']
-            failed = [o for o in self.completed_orders if o['status'] == 'failed']
-
-            stats = {
-                'total_orders': len(self.completed_orders),
-                'completed': len(completed),
-                'failed': len(failed),
-                'completion_rate': len(completed) / len(self.completed_orders) * 100 if self.completed_orders else 0,
-                'stage_times': defaultdict(float),
-                'throughput': len(completed) / (self.completed_orders[-1]['timestamps']['completed'] -
-                                                self.completed_orders[0]['timestamps']['created']) if completed else 0
-            }
-
-            if completed:
-                stats['avg_processing_time'] = sum(
-                    o['timestamps']['completed'] - o['timestamps']['created'] for o in completed
-                ) / len(completed)
-
-                for stage in ['availability', 'packaging', 'shipping']:
-                    stage_times = []
-                    for o in completed:
-                        if stage == 'availability':
-                            stage_times.append(
-                                o['timestamps']['packaging_start'] - o['timestamps']['availability_start'])
-                        elif stage == 'packaging':
-                            stage_times.append(o['timestamps']['shipping_start'] - o['timestamps']['packaging_start'])
-                        elif stage == 'shipping':
-                            stage_times.append(o['timestamps']['completed'] - o['timestamps']['shipping_start'])
+            completed = self.completed_count
+            failed = self.failed_count
+            processing_time_sum = self.processing_time_sum
+            stage_time_sums = dict(self.stage_time_sums)
+            first_created = self.first_created
+            last_completed = self.last_completed
+
+        total = completed + failed
+        stats = {
+            'total_orders': total,
+            'completed': completed,
+            'failed': failed,
+            'completion_rate': completed / total * 100 if total else 0,
+            'stage_times': defaultdict(float),
+            'throughput': completed / (last_completed - first_created)
+            if completed and last_completed > first_created else 0
+        }
 
-                    if stage_times:
-                        stats['stage_times'][stage] = sum(stage_times) / len(stage_times)
+        if completed:
+            stats['avg_processing_time'] = processing_time_sum / completed
+            for stage, time_sum in stage_time_sums.items():
+                stats['stage_times'][stage] = time_sum / completed
 
-            return stats
+        return stats
 
 
 class WarehouseSimulationGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Warehouse Order Simulation")
-        self.simulation = WarehouseSimulation(self.update_gui)
+        # Workers only append here (deque appends are thread-safe); the Tk loop
+        # drains it once per frame. Bounded like the log, as older events would
+        # scroll out of it anyway
+        self.events = deque(maxlen=LOG_LINES)
+        self.simulation = WarehouseSimulation(self.publish)
         self.setup_ui()
         self.running = False
         self.start_time = 0
         self.update_interval = 1000  # ms
+        self.root.after(FRAME_MS, self.drain_events)
 
     def setup_ui(self):
         # Control Frame
@@ -260,29 +302,27 @@ class WarehouseSimulationGUI:
         parent.grid_columnconfigure(0, weight=1)
         parent.grid_columnconfigure(1, weight=1)
 
-    def update_charts(self):
-        stats = self.simulation.get_stats()
-
-        # Clear previous charts
-        self.ax1.clear()
-        self.ax2.clear()
+        # Bars are drawn once and then only resized
+        self.status_bars = self.ax1.bar(['Completed', 'Failed'], [0, 0], color=['green', 'red'])
+        self.ax1.set_title('Order Completion Status')
+        self.ax1.set_ylabel('Number of Orders')
 
-        # Orders chart
-        if stats['total_orders'] > 0:
-            self.ax1.bar(['Completed', 'Failed'], [stats['completed'], stats['failed']], color=['green', 'red'])
-            self.ax1.set_title('Order Completion Status')
-            self.ax1.set_ylabel('Number of Orders')
+        self.stages = list(self.simulation.stage_time_sums)
+        self.stage_bars = self.ax2.bar(self.stages, [0] * len(self.stages), color=['blue', 'orange', 'purple'])
+        self.ax2.set_title('Average Time per Stage')
+        self.ax2.set_ylabel('Time (seconds)')
 
-        # Stage times chart
-        if stats['stage_times']:
-            stages = list(stats['stage_times'].keys())
-            times = [stats['stage_times'][stage] for stage in stages]
-            self.ax2.bar(stages, times, color=['blue', 'orange', 'purple'])
-            self.ax2.set_title('Average Time per Stage')
-            self.ax2.set_ylabel('Time (seconds)')
+    def update_charts(self, stats):
+        self.set_heights(self.ax1, self.status_bars, [stats['completed'], stats['failed']])
+        self.set_heights(self.ax2, self.stage_bars, [stats['stage_times'][stage] for stage in self.stages])
+        self.canvas1.draw_idle()
+        self.canvas2.draw_idle()
 
-        self.canvas1.draw()
-        self.canvas2.draw()
+    @staticmethod
+    def set_heights(ax, bars, heights):
+        for bar, height in zip(bars, heights):
+            bar.set_height(height)
+        ax.set_ylim(0, max(max(heights), 1) * 1.1)
 
     def start_simulation(self):
         employees_config = {
@@ -336,35 +376,49 @@ class WarehouseSimulationGUI:
 
         self.stats_text.config(state="disabled")
 
-        self.update_charts()
+        self.update_charts(stats)
 
         if self.running:
             self.root.after(self.update_interval, self.update_stats)
 
-    def update_gui(self, event_type, *args):
-        """Callback for simulation events"""
-        self.log_text.config(state="normal")
+    def publish(self, event_type, *args):
+        """Callback for simulation events; called from the simulation thread"""
+        self.events.append((event_type, args))
 
+    @staticmethod
+    def format_event(event_type, args):
         if event_type == "started":
-            self.log_text.insert(tk.END, "Simulation started\n")
-        elif event_type == "stopped":
-            self.log_text.insert(tk.END, "Simulation stopped\n")
-        elif event_type == "order_created":
-            order_id = args[0]
-            self.log_text.insert(tk.END, f"Order {order_id} created\n")
-        elif event_type == "stage_started":
+            return "Simulation started\n"
+        if event_type == "stopped":
+            return "Simulation stopped\n"
+        if event_type == "order_created":
+            return f"Order {args[0]} created\n"
+        if event_type == "stage_started":
             order_id, stage = args
-            self.log_text.insert(tk.END, f"Order {order_id} started {stage} stage\n")
-        elif event_type == "order_failed":
+            return f"Order {order_id} started {stage} stage\n"
+        if event_type == "order_failed":
             order_id, unavailable_items = args
-            self.log_text.insert(tk.END, f"Order {order_id} failed - unavailable items: {unavailable_items}\n")
-        elif event_type == "order_completed":
-            order_id = args[0]
-            self.log_text.insert(tk.END, f"Order {order_id} completed!\n")
-
-        self.log_text.see(tk.END)
-        self.log_text.config(state="disabled")
-
+            return f"Order {order_id} failed - unavailable items: {unavailable_items}\n"
+        if event_type == "order_completed":
+            return f"Order {args[0]} completed!\n"
+        return ""
+
+    def drain_events(self):
+        """Write the events published since the last frame to the log in one update"""
+        events = self.events
+        lines = []
+        while events:
+            lines.append(self.format_event(*events.popleft()))
+        if lines:
+            self.log_text.config(state="normal")
+            self.log_text.insert(tk.END, "".join(lines))
+            # Keep the last LOG_LINES lines; the widget ends with an empty one
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state="disabled")
+        self.root.after(FRAME_MS, self.drain_events)
 
 if __name__ == "__main__":
     root = tk.Tk()
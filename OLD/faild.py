@@ -1,7 +1,7 @@
+import asyncio
 import random
 import time
 import threading
-from queue import Queue
 from collections import defaultdict
 import matplotlib.pyplot as plt
 
@@ -11,16 +11,19 @@ class WarehouseSimulation:
         # Initialize simulation parameters
         self.num_employees_per_stage = {'availability': 2, 'packaging': 3, 'shipping': 2}
         self.available_items = set(random.sample(range(1000, 5000), 100))
-        self.stage_queues = {
-            'availability': Queue(),
-            'packaging': Queue(),
-            'shipping': Queue()
-        }
+        self.stage_queues = {}
         self.completed_orders = []
         self.lock = threading.Lock()
         self.running = False
         self.order_counter = 1
         self.employees = []
+        # Time compression: 1 plays the simulation live, 1000 a thousand times faster
+        self.speed = 1.0
+        # Every employee is a coroutine on one event loop, run by one thread
+        self.loop = None
+        self.thread = None
+        self._stop_event = None
+        self._started = 0
 
     def configure(self, employees_config):
         """Configure the simulation with new employee counts"""
@@ -28,6 +31,10 @@ class WarehouseSimulation:
         self.stop()  # Stop current simulation if running
         self.employees = []  # Clear existing employees
 
+    def clock(self):
+        """Simulated seconds since the start, i.e. wall time scaled by the speed."""
+        return (time.monotonic() - self._started) * self.speed
+
     def start(self):
         """Start the simulation"""
         if self.running:
@@ -37,30 +44,39 @@ class WarehouseSimulation:
         self.completed_orders = []
         self.order_counter = 1
 
-        # Create employee threads for each stage
+        self._started = time.monotonic()
+        self._stop_event = asyncio.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.run_employees(),), daemon=True)
+        self.thread.start()
+
+    async def run_employees(self):
+        """Run the order generator and one coroutine per employee until stopped"""
+        self.stage_queues = {stage: asyncio.Queue() for stage in ('availability', 'packaging', 'shipping')}
+        self.employees = [asyncio.create_task(self.generate_orders())]
         for stage, count in self.num_employees_per_stage.items():
             for i in range(count):
-                employee = threading.Thread(target=self.process_stage, args=(stage,))
-                employee.daemon = True
-                self.employees.append(employee)
-
-        # Start threads
-        threading.Thread(target=self.generate_orders, daemon=True).start()
+                self.employees.append(asyncio.create_task(self.process_stage(stage)))
+        await self._stop_event.wait()
+        # Cancelling wakes every employee right away, wherever it is waiting
         for employee in self.employees:
-            employee.start()
+            employee.cancel()
+        await asyncio.gather(*self.employees, return_exceptions=True)
 
     def stop(self):
         """Stop the simulation"""
         self.running = False
-        for employee in self.employees:
-            if employee.is_alive():
-                employee.join(timeout=1)
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self._stop_event.set)
+            self.thread.join()
+            self.loop.close()
+            self.thread = None
         self.employees = []
 
-    def generate_orders(self):
+    async def generate_orders(self):
         """Generate random orders with random intervals"""
         while self.running:
-            time.sleep(random.uniform(0.1, 2))
+            await asyncio.sleep(random.uniform(0.1, 2) / self.speed)
 
             num_items = random.randint(1, 5)
             items = [random.randint(1000, 5000) for _ in range(num_items)]
@@ -74,7 +90,7 @@ class WarehouseSimulation:
                 'items': items,
                 'status': 'created',
                 'timestamps': {
-                    'created': time.time(),
+                    'created': self.clock(),
                     'availability_start': None,
                     'packaging_start': None,
                     'shipping_start': None,
@@ -82,39 +98,41 @@ class WarehouseSimulation:
                 }
             }
 
-            self.stage_queues['availability'].put(order)
+            self.stage_queues['availability'].put_nowait(order)
 
-    def process_stage(self, stage):
+    async def process_stage(self, stage):
         """Process orders in a specific stage"""
         while self.running:
             try:
-                order = self.stage_queues[stage].get(timeout=1)
+                order = await self.stage_queues[stage].get()
 
                 with self.lock:
                     order['status'] = f'in_{stage}'
-                    order['timestamps'][f'{stage}_start'] = time.time()
+                    order['timestamps'][f'{stage}_start'] = self.clock()
 
                 processing_time = random.uniform(0.5, 3)
-                time.sleep(processing_time)
+                await asyncio.sleep(processing_time / self.speed)
 
                 if stage == 'availability':
                     unavailable_items = [item for item in order['items'] if item not in self.available_items]
                     if unavailable_items:
                         with self.lock:
                             order['status'] = 'failed'
-                            order['timestamps']['completed'] = time.time()
+                            order['timestamps']['completed'] = self.clock()
                         continue
 
-                    self.stage_queues['packaging'].put(order)
+                    self.stage_queues['packaging'].put_nowait(order)
                 elif stage == 'packaging':
-                    self.stage_queues['shipping'].put(order)
+                    self.stage_queues['shipping'].put_nowait(order)
                 elif stage == 'shipping':
                     with self.lock:
                         order['status'] = 'completed'
-                        order['timestamps']['completed'] = time.time()
+                        order['timestamps']['completed'] = self.clock()
                         self.completed_orders.append(order)
 
-            except:
+            except asyncio.CancelledError:
+                raise
+            except Exception:
                 continue
 
     def get_stats(self):
@@ -0,0 +1,81 @@
+import argparse
+import math
+
+import simulation
+
+
+def erlang_c(servers, load):
+    """Probability that an arrival has to wait in an M/M/c queue with offered load `load`."""
+    if load >= servers:
+        return 1.0
+    # Erlang B by its stable recursion, then converted to Erlang C
+    blocking = 1.0
+    for k in range(1, servers + 1):
+        blocking = load * blocking / (k + load * blocking)
+    utilization = load / servers
+    return blocking / (1 - utilization * (1 - blocking))
+
+
+def stage_arrival_rates(config):
+    """Order arrival rate at Check, Cover and Deliver; only available orders get past Check."""
+    rate = 1 / config.interarrival_mean
+    return (rate, rate * config.item_availability, rate * config.item_availability)
+
+
+def station(arrival_rate, service_mean, servers):
+    """Steady-state measures of one M/M/c stage."""
+    load = arrival_rate * service_mean
+    utilization = load / servers
+    if utilization >= 1:
+        return {'utilization': utilization, 'stable': False, 'wait_probability': 1.0,
+                'mean_wait': math.inf, 'mean_queue_length': math.inf, 'mean_time': math.inf}
+    wait_probability = erlang_c(servers, load)
+    mean_wait = wait_probability * service_mean / (servers - load)
+    return {
+        'utilization': utilization,
+        'stable': True,
+        'wait_probability': wait_probability,
+        'mean_wait': mean_wait,
+        'mean_queue_length': arrival_rate * mean_wait,
+        'mean_time': mean_wait + service_mean,
+    }
+
+
+def evaluate(config=simulation.SimConfig()):
+    """Jackson-network solution of the Check -> Cover -> Deliver model of `config`.
+
+    Orders arrive as a Poisson stream and every stage has exponential service,
+    so each stage behaves as an independent M/M/c queue. Cover and Deliver
+    only see the orders that pass the availability check, a thinned Poisson
+    stream. `total_time` is the mean time in system of completed orders.
+    """
+    check_rate, cover_rate, deliver_rate = stage_arrival_rates(config)
+    stages = {
+        'check': station(check_rate, config.check_time_mean, config.check_employees),
+        'cover': station(cover_rate, config.cover_time_mean, config.cover_employees),
+        'deliver': station(deliver_rate, config.deliver_time_mean, config.deliver_employees),
+    }
+    return {
+        'stages': stages,
+        'stable': all(s['stable'] for s in stages.values()),
+        'total_time': sum(s['mean_time'] for s in stages.values()),
+        'throughput': deliver_rate,
+    }
+
+
+if __name__ == "__main__":
+    defaults = simulation.SimConfig()
+    parser = argparse.ArgumentParser(description="Closed-form steady-state estimates of the order pipeline.")
+    parser.add_argument("--staffing", type=int, nargs=3, metavar=("CHECK", "COVER", "DELIVER"),
+                        default=defaults.staffing)
+    parser.add_argument("--interarrival-mean", type=float, default=defaults.interarrival_mean)
+    args = parser.parse_args()
+
+    result = evaluate(defaults.with_staffing(args.staffing).replace(interarrival_mean=args.interarrival_mean))
+    for name, stage in result['stages'].items():
+        print(f"{name}: utilization={stage['utilization']:.3f}, P(wait)={stage['wait_probability']:.3f}, "
+              f"mean wait={stage['mean_wait']:.3f}, mean queue={stage['mean_queue_length']:.3f}")
+    if result['stable']:
+        print(f"Mean total time in system: {result['total_time']:.3f}")
+    else:
+        print("Unstable: at least one stage has utilization >= 1")
@@ -0,0 +1,195 @@
+import csv
+import itertools
+import json
+import os
+
+# Columns of an order file; only `time` is required. Each row is one order
+# line: rows that share an `order_id` must be consecutive and form one order,
+# rows without one are single-line orders. Service times are optional and
+# only read from an order's first row.
+COLUMNS = ('time', 'order_id', 'sku', 'quantity', 'check_time', 'cover_time', 'deliver_time')
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.npy': 'npy'}
+
+_CONVERTERS = (float, str, str, int, float, float, float)
+_NPY_DTYPE = [('time', '<f8'), ('order_id', '<i8'), ('sku', '<i8'), ('quantity', '<i4'),
+              ('check_time', '<f8'), ('cover_time', '<f8'), ('deliver_time', '<f8')]
+
+
+def read_csv(path, buffer_size=1 << 20):
+    """Yield rows of a CSV order file as tuples in COLUMNS order, None where missing."""
+    with open(path, newline='', buffering=buffer_size) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if 'time' not in header:
+            raise ValueError(f"{path}: order files need a 'time' column")
+        fields = [(header.index(name) if name in header else None, convert)
+                  for name, convert in zip(COLUMNS, _CONVERTERS)]
+        for row in reader:
+            yield tuple(None if i is None or row[i] == '' else convert(row[i]) for i, convert in fields)
+
+
+def read_ndjson(path, buffer_size=1 << 20):
+    """Yield rows of an NDJSON order file.
+
+    A record holds the COLUMNS fields of one order line, or a whole order with
+    its lines in `basket`, as [[sku, quantity], ...] or {sku: quantity}.
+    """
+    with open(path, 'rb', buffering=buffer_size) as f:
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            services = (record.get('check_time'), record.get('cover_time'), record.get('deliver_time'))
+            basket = record.get('basket')
+            if basket is None:
+                yield (record['time'], record.get('order_id'), record.get('sku'),
+                       record.get('quantity'), *services)
+                continue
+            lines = list(basket.items() if isinstance(basket, dict) else basket) or [(None, None)]
+            # One order per record, whatever `order_id` says
+            key = ('record', number)
+            for sku, quantity in lines:
+                yield (record['time'], key, sku, quantity, *services)
+
+
+def read_npy(path, chunk_size=65536):
+    """Yield rows of a binary order file, memory-mapped and read `chunk_size` rows at a time.
+
+    The file is a .npy structured array (see `convert`); SKUs are inventory
+    slots, -1 means no SKU and NaN a missing service time.
+    """
+    import numpy as np
+
+    table = np.load(path, mmap_mode='r')
+    names = table.dtype.names or ()
+    if 'time' not in names:
+        raise ValueError(f"{path}: order files need a 'time' column")
+    for start in range(0, len(table), chunk_size):
+        chunk = table[start:start + chunk_size]
+        columns = []
+        for name in COLUMNS:
+            if name not in names:
+                columns.append(itertools.repeat(None))
+            elif name == 'sku' and len(chunk) and chunk['sku'].min() < 0:
+                columns.append([None if sku < 0 else sku for sku in chunk['sku'].tolist()])
+            else:
+                columns.append(chunk[name].tolist())
+        yield from zip(*columns)
+
+
+def _arrivals(rows, lookup=None, origin=None, time_scale=1.0):
+    """Group consecutive rows of an order into (time, basket, services) arrivals."""
+    arrival = None
+    key = None
+    for time, order_id, sku, quantity, check, cover, deliver in rows:
+        line = None
+        if sku is not None:
+            line = (sku if lookup is None else lookup(sku), 1 if quantity is None else quantity)
+        if arrival is not None and order_id is not None and order_id == key:
+            if line is not None:
+                arrival[1].append(line)
+            continue
+        if arrival is not None:
+            yield (arrival[0], arrival[1] or None, arrival[2])
+        if origin is None:
+            origin = time
+        services = None
+        # NaN != NaN marks missing binary values
+        if any(s is not None and s == s for s in (check, cover, deliver)):
+            services = tuple(s * time_scale if s is not None and s == s else None
+                             for s in (check, cover, deliver))
+        arrival = ((time - origin) * time_scale, [] if line is None else [line], services)
+        key = order_id
+    if arrival is not None:
+        yield (arrival[0], arrival[1] or None, arrival[2])
+
+
+def file_format(path, format=None):
+    if format is None:
+        format = FORMATS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise ValueError(f"cannot tell the format of {path}; pass one of {sorted(set(FORMATS.values()))}")
+    if format not in FORMATS.values():
+        raise ValueError(f"unknown order file format {format!r}")
+    return format
+
+
+def read_rows(path, format=None):
+    format = file_format(path, format)
+    if format == 'csv':
+        return read_csv(path)
+    if format == 'ndjson':
+        return read_ndjson(path)
+    return read_npy(path)
+
+
+def read_orders(path, format=None, inventory=None, origin=None, time_scale=1.0):
+    """Lazily yield one (time, basket, services) arrival per order of an order file.
+
+    Files are streamed, so memory stays flat whatever their size. `time` is
+    relative to `origin` (the first order's time by default) and, like the
+    service times, multiplied by `time_scale` to get model time units. With an
+    inventory, SKU names in text files are turned into its slots. `basket` is
+    a list of (sku, quantity) lines or None, `services` a (check, cover,
+    deliver) tuple whose missing entries are None, or None when the file has
+    none for the order.
+    """
+    format = file_format(path, format)
+    lookup = None
+    if inventory is not None and format != 'npy':
+        lookup = inventory.index.__getitem__
+    return _arrivals(read_rows(path, format), lookup, origin, time_scale)
+
+
+def read_order_table(path, catalog, format=None):
+    """Every order of an order file as one row of an order_model.OrderTable.
+
+    SKU names of text files are interned in `catalog` (binary files already
+    hold catalogue ids), so a recorded day of millions of orders fits in a
+    few flat arrays instead of one object per order and line.
+    """
+    from order_model import OrderTable
+
+    format = file_format(path, format)
+    lookup = None if format == 'npy' else catalog.intern
+    baskets = (basket or () for _, basket, _ in _arrivals(read_rows(path, format), lookup))
+    return OrderTable.from_baskets(catalog, baskets)
+
+
+def convert(source, path, format=None, inventory=None, chunk_size=65536):
+    """Write a CSV or NDJSON order file as a memory-mappable .npy file for `read_npy`.
+
+    Reads `source` twice (once to count rows) and writes `chunk_size` rows at
+    a time, so memory does not grow with the file. SKUs become inventory slots
+    when an inventory is given and must already be integers otherwise; order
+    ids are renumbered.
+    """
+    import numpy as np
+
+    format = file_format(source, format)
+    count = sum(1 for _ in read_rows(source, format))
+    table = np.lib.format.open_memmap(path, mode='w+', dtype=_NPY_DTYPE, shape=(count,))
+    chunk = np.empty(min(chunk_size, max(count, 1)), dtype=_NPY_DTYPE)
+    filled = 0
+    start = 0
+    order = -1
+    key = None
+    for row, (time, order_id, sku, quantity, check, cover, deliver) in enumerate(read_rows(source, format)):
+        if order_id is None or order_id != key or row == 0:
+            order += 1
+        key = order_id
+        if sku is None:
+            sku = -1
+        elif inventory is not None:
+            sku = inventory.index[sku]
+        chunk[filled] = (time, order, int(sku), 1 if quantity is None else quantity,
+                         *(float('nan') if s is None else s for s in (check, cover, deliver)))
+        filled += 1
+        if filled == len(chunk):
+            table[start:start + filled] = chunk
+            start += filled
+            filled = 0
+    table[start:start + filled] = chunk[:filled]
+    table.flush()
+    del table
+    return count
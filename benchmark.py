@@ -0,0 +1,194 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+import analytic
+import simulation
+from profiling import peak_rss_mb
+
+ENGINES = simulation.ENGINES
+
+# Largest order count worth running per engine; the simpy model does ~1e4-1e5 orders/s
+MAX_ORDERS = {"simpy": 10**6, "numpy": 10**7, "kernel": 10**7}
+
+SUITES = {
+    "quick": {"orders": (10**3, 10**4), "staff": (1, 10), "loads": (0.5, 0.9)},
+    "full": {"orders": (10**3, 10**4, 10**5, 10**6, 10**7), "staff": (1, 10, 200),
+             "loads": (0.5, 0.8, 0.95)},
+}
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Short cases are rerun in the same process until this much time has been spent
+MIN_WALL_SECONDS = 0.2
+
+# Measured noise widens the allowed slowdown to at most this many times the tolerance
+MAX_NOISE_FACTOR = 3
+
+
+def case_config(engine, orders, staff, load, seed=simulation.RANDOM_SEED):
+    """Config with `staff` employees per stage and the busiest stage at utilization `load`."""
+    base = simulation.SimConfig()
+    # Stage arrival rates per unit of order arrival rate
+    thinning = analytic.stage_arrival_rates(base.replace(interarrival_mean=1))
+    means = (base.check_time_mean, base.cover_time_mean, base.deliver_time_mean)
+    # Arrival rate that brings the bottleneck stage to the requested utilization
+    rate = load * min(staff / (p * m) for p, m in zip(thinning, means))
+    return base.replace(check_employees=staff, cover_employees=staff, deliver_employees=staff,
+                        interarrival_mean=1 / rate, num_orders=orders, sim_time=None,
+                        seed=seed, engine=engine)
+
+
+def case_key(engine, orders, staff, load):
+    return f"{engine}/orders={orders}/staff={staff}/load={load}"
+
+
+def model_events(stats):
+    # Arrival, start and end of three stages for a completed order;
+    # arrival, check start, check end and cancel for a cancelled one
+    return 7 * stats['orders_completed'] + 4 * stats['orders_cancelled']
+
+
+def measure(config, min_wall=MIN_WALL_SECONDS):
+    """Run one case; meant to be called in a fresh process so peak RSS is its own.
+
+    The case is rerun until `min_wall` seconds have passed, so runs of a few
+    milliseconds are timed often enough for their fastest run to be stable.
+    """
+    # Warm-up run so lazy engine imports are not timed
+    simulation.run(config.replace(num_orders=10))
+    walls = []
+    while not walls or sum(walls) < min_wall:
+        start = time.perf_counter()
+        results = simulation.run(config)
+        walls.append(time.perf_counter() - start)
+    orders = results.orders_completed + results.orders_cancelled
+    return {
+        "walls": walls,
+        "orders": orders,
+        "events": model_events(results.stats),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure_in_process(config, min_wall=MIN_WALL_SECONDS):
+    # A new interpreter per repetition keeps one case's memory out of the next
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(measure, (config, min_wall))
+
+
+def summarize(measurements):
+    """Fastest run over several `measure` calls, with the spread of their fastest runs.
+
+    `noise` is how far the slowest call's best run is above the fastest,
+    relative to it; `compare` does not flag slowdowns within it.
+    """
+    bests = [min(m["walls"]) for m in measurements]
+    wall = min(bests)
+    last = measurements[-1]
+    return {
+        "wall_seconds": wall,
+        "noise": max(bests) / wall - 1,
+        "runs": sum(len(m["walls"]) for m in measurements),
+        "orders": last["orders"],
+        "events": last["events"],
+        "orders_per_second": last["orders"] / wall,
+        "events_per_second": last["events"] / wall,
+        "peak_rss_mb": last["peak_rss_mb"],
+    }
+
+
+def run_case(config, repeat=3, min_wall=MIN_WALL_SECONDS):
+    return summarize([measure_in_process(config, min_wall) for _ in range(repeat)])
+
+
+def run_suite(suite="quick", engines=ENGINES, repeat=3, log=print):
+    """Run every case of `suite` `repeat` times and summarize each.
+
+    The repetitions are whole passes over the suite rather than back-to-back
+    runs of one case, so a machine that slows down for a while widens the
+    measured noise instead of skewing a few cases.
+    """
+    spec = SUITES[suite]
+    cases = {}
+    for engine, orders, staff, load in itertools.product(engines, spec["orders"], spec["staff"], spec["loads"]):
+        if orders <= MAX_ORDERS.get(engine, max(MAX_ORDERS.values())):
+            cases[case_key(engine, orders, staff, load)] = case_config(engine, orders, staff, load)
+    measurements = {key: [] for key in cases}
+    for _ in range(repeat):
+        for key, config in cases.items():
+            measurements[key].append(measure_in_process(config))
+    results = {}
+    for key, runs in measurements.items():
+        r = results[key] = summarize(runs)
+        if log:
+            log(f"{key}: {r['wall_seconds']:.4f}s (+{r['noise']:.0%}, {r['runs']} runs), "
+                f"{r['orders_per_second']:,.0f} orders/s, {r['events_per_second']:,.0f} events/s, "
+                f"peak RSS {r['peak_rss_mb']:.0f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance=0.10):
+    """Cases whose orders/second dropped below the baseline by more than the noise.
+
+    A case is only flagged when its slowdown exceeds both `tolerance` and the
+    spread measured in this run and in the baseline, so run-to-run jitter of
+    short cases is not reported as a regression. The spread counts for at
+    most MAX_NOISE_FACTOR times `tolerance`, so a noisy run or baseline
+    cannot hide a real slowdown: with the defaults, anything below 77% of
+    the baseline is flagged.
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if previous is None:
+            continue
+        ratio = result["orders_per_second"] / previous["orders_per_second"]
+        noise = result.get("noise", 0.0) + previous.get("noise", 0.0)
+        allowed = max(tolerance, min(noise, MAX_NOISE_FACTOR * tolerance))
+        if ratio < 1 / (1 + allowed):
+            regressions.append((key, ratio))
+    return regressions
+
+
+def save(results, path, suite):
+    with open(path, "w") as f:
+        json.dump({
+            "suite": suite,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure simulator throughput across model sizes and engines.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the suite, each case in a fresh process; the fastest run is kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="previous results to compare against")
+    parser.add_argument("--save", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    results = run_suite(args.suite, args.engines, args.repeat)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for key, ratio in regressions:
+        print(f"REGRESSION {key}: {ratio:.0%} of baseline orders/s")
+
+    if args.save:
+        save(results, args.baseline, args.suite)
+        print(f"Saved baseline to {args.baseline}")
+    sys.exit(1 if regressions else 0)
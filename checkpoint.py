@@ -0,0 +1,228 @@
+import argparse
+import copy
+import pickle
+import time
+from dataclasses import dataclass
+
+import simpy
+
+import simulation
+from events import ARRIVED, CANCELLED, CHECK, COVER, DELIVER, FINISHED, STARTED, NullSink, TeeSink
+from streams import SOURCES, make_streams
+
+
+class StateTracker(NullSink):
+    """Sink that follows every in-flight order, so the run can be checkpointed.
+
+    Per order it keeps the process, the arrival time, when it joined its
+    current queue, when its current service started and the waits and
+    services of the stages it has been through.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.orders = {}
+        self.arrived = 0
+
+    def emit(self, time, order_id, stage, kind):
+        if kind == ARRIVED:
+            self.orders[order_id] = [self.env.active_process, time, time, None, [], []]
+            self.arrived += 1
+        elif kind == STARTED:
+            order = self.orders[order_id]
+            order[4].append(time - order[2])
+            order[3] = time
+        elif kind == CANCELLED or stage == DELIVER:
+            del self.orders[order_id]
+        else:
+            order = self.orders[order_id]
+            order[5].append(time - order[3])
+            order[2] = time
+            order[3] = None
+
+
+@dataclass
+class Checkpoint:
+    """Full state of a simpy-engine run at simulated time `time`.
+
+    `orders` holds one (order_id, stage, arrival, enter, start, end, waits,
+    services) tuple per in-flight order: per stage the orders in service
+    (`end` is when their service finishes) and then the queue in FIFO order
+    (`start` and `end` are None). `streams` maps each source to the state of
+    its random stream.
+    """
+
+    config: simulation.SimConfig
+    time: float
+    stats: dict
+    streams: dict
+    orders: list
+    next_order: int
+    next_arrival: float | None  # when order `next_order` arrives, None once all have
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+def capture(env, warehouse, stats, tracker, arrivals):
+    """Checkpoint of a run stopped between events, traced by `tracker`."""
+    # simpy does not expose when a pending timeout fires; read it off the event queue
+    scheduled = {event: at for at, _, _, event in env._queue}
+    by_process = {order[0]: (order_id, order) for order_id, order in tracker.orders.items()}
+    orders = []
+    for stage, resource in ((CHECK, warehouse.checkers), (COVER, warehouse.coverers),
+                            (DELIVER, warehouse.deliverers)):
+        for request in resource.users:
+            order_id, (_, arrival, enter, start, waits, services) = by_process[request.proc]
+            # The order waits on its stage process, which waits on the service timeout
+            end = scheduled[request.proc.target.target]
+            orders.append((order_id, stage, arrival, enter, start, end, tuple(waits), tuple(services)))
+        for request in resource.put_queue:
+            order_id, (_, arrival, enter, _, waits, services) = by_process[request.proc]
+            orders.append((order_id, stage, arrival, enter, None, None, tuple(waits), tuple(services)))
+    if len(orders) != len(tracker.orders):
+        raise RuntimeError("some in-flight orders are neither queued nor in service")
+
+    streams = {source: getattr(warehouse, f"{source}_rng").getstate() for source in SOURCES}
+    next_arrival = scheduled[arrivals.target] if arrivals.is_alive else None
+    return Checkpoint(warehouse.config, env.now, stats, streams, orders, tracker.arrived, next_arrival)
+
+
+def warm_up(config=simulation.SimConfig(), until=simulation.SIM_TIME, sink=None):
+    """Run `config` on the simpy engine up to simulated time `until` and checkpoint it."""
+    if config.engine != "simpy":
+        raise ValueError("checkpoints need the simpy engine")
+    env = simpy.Environment()
+    stats = simulation.new_stats(config.keep_samples)
+    tracker = StateTracker(env)
+    warehouse = simulation.Warehouse(env, config, sink=tracker if sink is None else TeeSink(sink, tracker))
+    arrivals = env.process(simulation.generate_orders(env, warehouse, stats))
+    env.run(until=until)
+    warehouse.sink.flush()
+    return capture(env, warehouse, stats, tracker, arrivals)
+
+
+def resume_order(env, warehouse, stats, order):
+    """Carry a checkpointed order through the rest of the pipeline, as order_process would."""
+    order_id, stage, arrival, enter, start, end, waits, services = order
+    waits, services = list(waits), list(services)
+    emit = warehouse.sink.emit
+    stages = ((CHECK, warehouse.checkers, warehouse.check_order),
+              (COVER, warehouse.coverers, warehouse.cover_order),
+              (DELIVER, warehouse.deliverers, warehouse.deliver_order))
+    for current, resource, serve in stages[stage - CHECK:]:
+        with resource.request() as request:
+            if start is None:
+                yield request
+                waits.append(env.now - enter)
+                emit(env.now, order_id, current, STARTED)
+                start = env.now
+                yield env.process(serve(order_id))
+                services.append(env.now - start)
+            else:
+                # Back in service; it only waits if the stage now has fewer employees
+                resumed = env.now
+                yield request
+                waits[-1] += env.now - resumed
+                yield env.process(serve(order_id, end - resumed))
+                services.append(end - start)
+
+            if current == CHECK and not warehouse.draw_availability() < warehouse.config.item_availability:
+                emit(env.now, order_id, CHECK, CANCELLED)
+                stats['orders_cancelled'] += 1
+                return
+            emit(env.now, order_id, current, FINISHED)
+        enter = env.now
+        start = None
+
+    check_wait, cover_wait, deliver_wait = waits
+    check_service, cover_service, deliver_service = services
+    stats['check_waits'].append(check_wait)
+    stats['check_services'].append(check_service)
+    stats['cover_waits'].append(cover_wait)
+    stats['cover_services'].append(cover_service)
+    stats['deliver_waits'].append(deliver_wait)
+    stats['deliver_services'].append(deliver_service)
+    stats['total_times'].append(env.now - arrival)
+    stats['orders_completed'] += 1
+
+
+def resume_arrivals(env, warehouse, stats, next_order, next_arrival):
+    if next_arrival is None:
+        return
+    yield env.timeout(next_arrival - env.now)
+    env.process(simulation.order_process(env, next_order, warehouse, stats))
+    yield from simulation.generate_orders(env, warehouse, stats, first=next_order + 1)
+
+
+def fork(checkpoint, config=None, sink=None, seed=None):
+    """Continue `checkpoint` as the scenario `config` and return its SimResults.
+
+    `config` defaults to the checkpointed one and may change staffing, means,
+    availability, order count or horizon (`sim_time` is absolute). The
+    restored random streams continue where the checkpoint left them, so an
+    unchanged fork reproduces the uninterrupted run; a `seed` gives the branch
+    fresh ones instead. Orders in service keep their remaining service time;
+    if a stage has fewer employees than busy orders, the excess queue first
+    and finish their remaining service once an employee is free. Sinks only
+    see the events after the checkpoint.
+    """
+    base = checkpoint.config
+    config = base if config is None else config
+    if config.engine != "simpy":
+        raise ValueError("checkpoints need the simpy engine")
+    env = simpy.Environment(initial_time=checkpoint.time)
+    streams = make_streams(base.seed if seed is None else seed, base.streams, base.antithetic)
+    if seed is None:
+        for source, state in checkpoint.streams.items():
+            streams[source].setstate(state)
+    stats = copy.deepcopy(checkpoint.stats)
+    warehouse = simulation.Warehouse(env, config, streams, sink)
+    monitors = None
+    if config.monitor:
+        from monitors import attach
+        monitors = attach(warehouse, horizon=config.sim_time and config.sim_time - checkpoint.time)
+
+    for order in checkpoint.orders:
+        env.process(resume_order(env, warehouse, stats, order))
+    env.process(resume_arrivals(env, warehouse, stats, checkpoint.next_order, checkpoint.next_arrival))
+    env.run(until=config.sim_time)
+    warehouse.sink.flush()
+    for monitor in (monitors or {}).values():
+        monitor.finish()
+    return simulation.SimResults(config, stats, None, monitors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm a run up once, then fork what-if scenarios from it.")
+    parser.add_argument("--at", type=float, required=True, help="simulated time of the checkpoint")
+    parser.add_argument("--sim-time", type=float, default=0, help="end of the scenarios; 0 runs until every order is done")
+    parser.add_argument("--orders", type=int, default=simulation.NUM_ORDERS)
+    parser.add_argument("--seed", type=int, default=simulation.RANDOM_SEED)
+    parser.add_argument("--staffing", type=int, nargs=3, action="append", metavar=("CHECK", "COVER", "DELIVER"),
+                        help="staffing of one scenario after the checkpoint; repeat for more")
+    parser.add_argument("--branches", type=int, default=1, help="random futures per scenario")
+    parser.add_argument("--save", metavar="FILE", help="also write the checkpoint to FILE")
+    args = parser.parse_args()
+
+    from replications import replication_seed
+
+    config = simulation.SimConfig(num_orders=args.orders, seed=args.seed, sim_time=args.sim_time or None)
+    started = time.perf_counter()
+    state = warm_up(config, args.at)
+    print(f"Checkpoint at t={state.time}: {len(state.orders)} orders in flight, "
+          f"{state.stats['orders_completed']} completed ({time.perf_counter() - started:.2f}s)")
+    if args.save:
+        state.save(args.save)
+    for staffing in args.staffing or [config.staffing]:
+        scenario = config.with_staffing(staffing)
+        for branch in range(args.branches):
+            results = fork(state, scenario, seed=None if args.branches == 1 else replication_seed(args.seed, branch))
+            print(f"staffing {tuple(staffing)} branch {branch}: completed={results.orders_completed}, "
+                  f"mean total time={results['total_times'].mean:.2f}")
@@ -0,0 +1,158 @@
+import math
+from collections import deque
+from functools import partial
+from heapq import heappop, heappush
+
+from events import ARRIVED, CANCELLED, CHECK, COVER, DELIVER, FINISHED, ORDER, STARTED, NullSink
+from inventory import random_basket
+from streams import make_streams
+
+# Stage events in the calendar, indexed like the staffing tuple
+STAGE_EVENTS = (CHECK, COVER, DELIVER)
+
+
+def run_kernel(config, stats, sink=None, inventory=None, arrivals=None, variates=None, metrics=None):
+    """Event-calendar equivalent of the simpy Check -> Cover -> Deliver model.
+
+    The calendar is a binary heap of (time, sequence, stage, order) tuples and
+    every stage is a count of free employees plus a FIFO queue, so an order is
+    one list instead of a generator, three requests and three service
+    processes. Fills `stats` like simulation.order_process and takes the same
+    sink, inventory, replayed `arrivals` and block-sampled `variates`; a
+    profiling.RunMetrics gets to watch the calendar.
+
+    Random draws are made when the simpy model makes them, so with per-source
+    streams a run reproduces the simpy one exactly; with the shared stream the
+    draws interleave differently and only the distributions agree.
+    """
+    sink = sink if sink is not None else NullSink()
+    # Skip the calls altogether when nothing listens
+    emit = None if type(sink) is NullSink else sink.emit
+    streams = make_streams(config.seed, config.streams, config.antithetic)
+    if variates is None:
+        draws = (partial(streams['check'].expovariate, 1/config.check_time_mean),
+                 partial(streams['cover'].expovariate, 1/config.cover_time_mean),
+                 partial(streams['deliver'].expovariate, 1/config.deliver_time_mean))
+        draw_interarrival = partial(streams['arrival'].expovariate, 1/config.interarrival_mean)
+        availability = streams['availability'].random
+    else:
+        draws = (variates['check'], variates['cover'], variates['deliver'])
+        draw_interarrival = variates['arrival']
+        availability = variates['availability']
+    item_availability = config.item_availability
+    horizon = math.inf if config.sim_time is None else config.sim_time
+
+    free = list(config.staffing)
+    queues = (deque(), deque(), deque())
+    calendar = []
+    sequence = 0
+    if metrics is not None:
+        metrics.calendar = calendar
+
+    check_waits, check_services = stats['check_waits'].append, stats['check_services'].append
+    cover_waits, cover_services = stats['cover_waits'].append, stats['cover_services'].append
+    deliver_waits, deliver_services = stats['deliver_waits'].append, stats['deliver_services'].append
+    total_times = stats['total_times'].append
+    completed = cancelled = 0
+
+    # An order is [order_id, arrival, basket, services, service start, then wait and service per stage]
+    def start(stage, order, enter, now):
+        nonlocal sequence
+        order.append(now - enter)
+        order[4] = now
+        if emit is not None:
+            emit(now, order[0], STAGE_EVENTS[stage], STARTED)
+        services = order[3]
+        duration = services[stage] if services is not None else None
+        if duration is None:
+            duration = draws[stage]()
+        sequence += 1
+        heappush(calendar, (now + duration, sequence, stage, order))
+
+    if arrivals is None:
+        def generated():
+            now = 0.0
+            for _ in range(config.num_orders):
+                now += draw_interarrival()
+                yield now, None, None
+        arrivals = generated()
+    arrivals = iter(arrivals)
+    basket_rng = streams['basket']
+
+    order_id = 0
+    upcoming = next(arrivals, None)
+    # Like the simpy replay, records before time 0 arrive at 0
+    next_arrival = math.inf if upcoming is None else max(upcoming[0], 0.0)
+
+    while True:
+        if calendar and calendar[0][0] <= next_arrival:
+            now, _, stage, order = heappop(calendar)
+            if now >= horizon:
+                break
+            order.append(now - order[4])
+            available = True
+            if stage == 0:
+                if inventory is None:
+                    available = availability() < item_availability
+                else:
+                    available = inventory.reserve(order[2])
+            if emit is not None:
+                emit(now, order[0], STAGE_EVENTS[stage], FINISHED if available else CANCELLED)
+            # The employee takes the next order in line, if any
+            queue = queues[stage]
+            if queue:
+                enter, waiting = queue.popleft()
+                start(stage, waiting, enter, now)
+            else:
+                free[stage] += 1
+            if not available:
+                cancelled += 1
+                continue
+            if stage < 2:
+                stage += 1
+                if free[stage]:
+                    free[stage] -= 1
+                    start(stage, order, now, now)
+                else:
+                    queues[stage].append((now, order))
+                continue
+
+            _, arrival, _, _, _, check_wait, check_service, cover_wait, cover_service, deliver_wait, deliver_service = order
+            check_waits(check_wait)
+            check_services(check_service)
+            cover_waits(cover_wait)
+            cover_services(cover_service)
+            deliver_waits(deliver_wait)
+            deliver_services(deliver_service)
+            total_times(now - arrival)
+            completed += 1
+        elif next_arrival < math.inf:
+            now = next_arrival
+            if now >= horizon:
+                break
+            _, basket, services = upcoming
+            if inventory is not None and basket is None:
+                basket = random_basket(basket_rng, inventory, config.max_basket_lines)
+            if emit is not None:
+                emit(now, order_id, ORDER, ARRIVED)
+            order = [order_id, now, basket, services, now]
+            if free[0]:
+                free[0] -= 1
+                start(0, order, now, now)
+            else:
+                queues[0].append((now, order))
+            order_id += 1
+            upcoming = next(arrivals, None)
+            if upcoming is None:
+                next_arrival = math.inf
+            else:
+                if upcoming[0] < now:
+                    raise ValueError(f"arrival {order_id} at t={upcoming[0]} comes before the previous one at t={now}")
+                next_arrival = upcoming[0]
+        else:
+            break
+
+    stats['orders_completed'] += completed
+    stats['orders_cancelled'] += cancelled
+    sink.flush()
+    return stats
@@ -0,0 +1,188 @@
+import json
+import struct
+from array import array
+
+# Stages and event kinds are stored as small ints so trace records stay compact
+STAGES = ('order', 'check', 'cover', 'deliver')
+ORDER, CHECK, COVER, DELIVER = range(len(STAGES))
+KINDS = ('arrived', 'started', 'finished', 'cancelled')
+ARRIVED, STARTED, FINISHED, CANCELLED = range(len(KINDS))
+
+LEVELS = ('off', 'counters', 'trace', 'console')
+
+_CHUNK_HEADER = struct.Struct('<I')
+
+
+class NullSink:
+    """Discards every event; the default for headless runs."""
+
+    level = 'off'
+
+    def emit(self, time, order_id, stage, kind):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class CounterSink(NullSink):
+    """Only counts events per (stage, kind)."""
+
+    level = 'counters'
+
+    def __init__(self):
+        self._counts = [0] * (len(STAGES) * len(KINDS))
+
+    def emit(self, time, order_id, stage, kind):
+        self._counts[stage * len(KINDS) + kind] += 1
+
+    def counts(self):
+        return {(STAGES[i // len(KINDS)], KINDS[i % len(KINDS)]): count
+                for i, count in enumerate(self._counts) if count}
+
+
+class TraceSink(CounterSink):
+    """Buffers every event as a (time, order_id, stage, kind) record.
+
+    Records are kept in typed arrays and written in bulk to `path` whenever
+    `buffer_size` of them have accumulated, either as NDJSON or as binary
+    chunks (see `read_trace`). Without a path they stay in memory.
+    """
+
+    level = 'trace'
+
+    def __init__(self, path=None, format='binary', buffer_size=65536):
+        super().__init__()
+        if format not in ('binary', 'ndjson'):
+            raise ValueError(f"unknown trace format {format!r}")
+        self.path = path
+        self.format = format
+        self.buffer_size = buffer_size
+        self._file = open(path, 'wb') if path else None
+        self._reset()
+
+    def _reset(self):
+        self.times = array('d')
+        self.order_ids = array('q')
+        self.stages = array('B')
+        self.kinds = array('B')
+
+    def emit(self, time, order_id, stage, kind):
+        self._counts[stage * len(KINDS) + kind] += 1
+        self.times.append(time)
+        self.order_ids.append(order_id)
+        self.stages.append(stage)
+        self.kinds.append(kind)
+        if self._file is not None and len(self.times) >= self.buffer_size:
+            self.flush()
+
+    def records(self):
+        return zip(self.times, self.order_ids, self.stages, self.kinds)
+
+    def flush(self):
+        if self._file is None or not self.times:
+            return
+        if self.format == 'binary':
+            self._file.write(_CHUNK_HEADER.pack(len(self.times)))
+            for column in (self.times, self.order_ids, self.stages, self.kinds):
+                self._file.write(column.tobytes())
+        else:
+            lines = [f'{{"time":{t!r},"order_id":{o},"stage":"{STAGES[s]}","kind":"{KINDS[k]}"}}\n'
+                     for t, o, s, k in self.records()]
+            self._file.write(''.join(lines).encode())
+        self._file.flush()
+        self._reset()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ConsoleSink(CounterSink):
+    """Prints the human-readable event log of the original script."""
+
+    level = 'console'
+
+    def __init__(self):
+        super().__init__()
+        # Time each in-flight order joined its current queue
+        self._since = {}
+
+    def emit(self, time, order_id, stage, kind):
+        self._counts[stage * len(KINDS) + kind] += 1
+        if kind == ARRIVED:
+            message = "arrived."
+        elif kind == STARTED:
+            wait = time - self._since[order_id]
+            verb = {CHECK: "checking", COVER: "covering", DELIVER: "delivering"}[stage]
+            message = f"{verb} started after waiting {wait:.2f}."
+        elif kind == CANCELLED:
+            message = "cancelled (item unavailable)."
+        else:
+            message = {CHECK: "passed checking.", COVER: "covered.", DELIVER: "delivered."}[stage]
+        if kind in (ARRIVED, FINISHED):
+            self._since[order_id] = time
+        if kind == CANCELLED or (kind == FINISHED and stage == DELIVER):
+            self._since.pop(order_id, None)
+        print(f"[{time:.2f}] Order {order_id} {message}")
+
+
+class TeeSink(NullSink):
+    """Forwards every event to several sinks."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self.level = max((sink.level for sink in sinks), key=LEVELS.index)
+        self._emits = [sink.emit for sink in sinks]
+
+    def emit(self, time, order_id, stage, kind):
+        for emit in self._emits:
+            emit(time, order_id, stage, kind)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def make_sink(level='off', path=None, format='binary', buffer_size=65536):
+    if level == 'off':
+        return NullSink()
+    if level == 'counters':
+        return CounterSink()
+    if level == 'trace':
+        return TraceSink(path, format, buffer_size)
+    if level == 'console':
+        return ConsoleSink()
+    raise ValueError(f"unknown event level {level!r}, expected one of {LEVELS}")
+
+
+def read_trace(path, format='binary'):
+    """Yield (time, order_id, stage, kind) records from a TraceSink file."""
+    if format == 'ndjson':
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                yield (record['time'], record['order_id'],
+                       STAGES.index(record['stage']), KINDS.index(record['kind']))
+        return
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_CHUNK_HEADER.size)
+            if not header:
+                return
+            (count,) = _CHUNK_HEADER.unpack(header)
+            columns = []
+            for typecode in ('d', 'q', 'B', 'B'):
+                column = array(typecode)
+                column.frombytes(f.read(count * column.itemsize))
+                columns.append(column)
+            yield from zip(*columns)
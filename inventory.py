@@ -0,0 +1,103 @@
+from array import array
+
+
+class Inventory:
+    """Warehouse stock keyed by SKU name.
+
+    Every SKU gets a fixed slot: `index` maps the name to it in O(1) and the
+    quantities live in one flat array of 64-bit ints, so a catalogue of
+    millions of SKUs costs a few bytes per SKU plus the name index. Hot paths
+    (baskets, reservations) work on slots; names are only needed at the edges.
+    """
+
+    def __init__(self, stock=()):
+        self.index = {}
+        self.names = []
+        self.quantities = array('q')
+        items = stock.items() if hasattr(stock, 'items') else stock
+        for name, quantity in items:
+            self.add_item(name, quantity)
+
+    @classmethod
+    def from_arrays(cls, names, quantities):
+        """Bulk constructor for large catalogues; `names` must be unique."""
+        inventory = cls()
+        inventory.names = list(names)
+        inventory.index = {name: slot for slot, name in enumerate(inventory.names)}
+        if len(inventory.index) != len(inventory.names):
+            raise ValueError("duplicate SKU names")
+        inventory.quantities = array('q', quantities)
+        return inventory
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def slot(self, name):
+        """Slot of `name`, or None if the SKU is unknown."""
+        return self.index.get(name)
+
+    def add_item(self, name, quantity):
+        slot = self.index.get(name)
+        if slot is None:
+            slot = len(self.names)
+            self.index[name] = slot
+            self.names.append(name)
+            self.quantities.append(quantity)
+        else:
+            self.quantities[slot] += quantity
+        return slot
+
+    def quantity(self, name):
+        slot = self.index.get(name)
+        return 0 if slot is None else self.quantities[slot]
+
+    def is_available(self, name, quantity=1):
+        slot = self.index.get(name)
+        return slot is not None and self.quantities[slot] >= quantity
+
+    def take_item(self, name, quantity):
+        slot = self.index.get(name)
+        if slot is None or self.quantities[slot] < quantity:
+            return False
+        self.quantities[slot] -= quantity
+        return True
+
+    def reserve(self, lines):
+        """Take a whole basket of (slot, quantity) lines, or nothing at all.
+
+        Returns False and leaves the stock untouched if any line cannot be
+        served; repeated slots are naturally counted together.
+        """
+        quantities = self.quantities
+        taken = 0
+        for slot, quantity in lines:
+            if quantities[slot] < quantity:
+                break
+            quantities[slot] -= quantity
+            taken += 1
+        else:
+            return True
+        # Put back the lines taken before the one that failed
+        for slot, quantity in lines[:taken]:
+            quantities[slot] += quantity
+        return False
+
+    def release(self, lines):
+        """Put back a basket taken by `reserve`."""
+        quantities = self.quantities
+        for slot, quantity in lines:
+            quantities[slot] += quantity
+
+    def slots(self, basket):
+        """Turn {name: quantity} into (slot, quantity) lines; unknown names raise KeyError."""
+        index = self.index
+        return [(index[name], quantity) for name, quantity in basket.items()]
+
+
+def random_basket(rng, inventory, max_lines=5):
+    """Basket of 1..max_lines random SKUs of `inventory`, one unit each."""
+    skus = len(inventory)
+    return [(rng.randrange(skus), 1) for _ in range(rng.randint(1, max_lines))]
@@ -0,0 +1,145 @@
+from array import array
+
+
+class ResourceMonitor:
+    """Time-weighted queue length and busy servers of one simpy.Resource.
+
+    The resource's put trigger is wrapped, so the integrals are only updated
+    when a request joins the queue or a release lets the next one in; nothing
+    polls. Besides the run totals, the time axis is cut into at most
+    `max_points` intervals holding the mean queue length and utilization in
+    each. When the run outgrows them, neighbouring intervals are merged and
+    the width doubles, so memory stays bounded however long the run is.
+    """
+
+    def __init__(self, resource, max_points=1024, width=1.0):
+        self.resource = resource
+        self.env = env = resource._env
+        self.capacity = resource.capacity
+        self.max_points = max_points
+        self.width = width
+        self.start = env.now
+        put_queue, users = resource.put_queue, resource.users
+        # Hot state in one list, read and written by the trigger closure below:
+        # last change, queue length and busy servers since then, the largest
+        # queue, the areas of the open interval and where it ends
+        self._state = state = [env.now, len(put_queue), len(users), len(put_queue), 0.0, 0.0, env.now + width]
+        # Areas of the closed intervals
+        self._queue_areas = array('d')
+        self._busy_areas = array('d')
+        advance = self._advance
+        trigger_put = resource._trigger_put
+
+        # simpy calls _trigger_put when a request is made and, at the same
+        # simulated time, after every release, so it sees every change
+        def monitored_trigger_put(event):
+            trigger_put(event)
+            now = env.now
+            last = state[0]
+            if now != last:
+                if now <= state[6]:
+                    state[4] += state[1] * (now - last)
+                    state[5] += state[2] * (now - last)
+                else:
+                    advance(now)
+                state[0] = now
+            queue = len(put_queue)
+            state[1] = queue
+            state[2] = len(users)
+            if queue > state[3]:
+                state[3] = queue
+
+        resource._trigger_put = monitored_trigger_put
+
+    def _advance(self, until):
+        # Spread the time since the last change over the intervals it crosses
+        state = self._state
+        t, queue, busy = state[0], state[1], state[2]
+        while True:
+            end = min(until, state[6])
+            state[4] += queue * (end - t)
+            state[5] += busy * (end - t)
+            t = end
+            if t >= until:
+                break
+            self._queue_areas.append(state[4])
+            self._busy_areas.append(state[5])
+            state[4] = state[5] = 0.0
+            if len(self._queue_areas) >= self.max_points:
+                self._coarsen()
+            state[6] = self.start + (len(self._queue_areas) + 1) * self.width
+
+    def _coarsen(self):
+        # Merge the closed intervals in pairs and double their width
+        queue_areas, busy_areas = self._queue_areas, self._busy_areas
+        if len(queue_areas) % 2:
+            # The odd one out becomes the start of the open interval
+            self._state[4] += queue_areas.pop()
+            self._state[5] += busy_areas.pop()
+        self._queue_areas = array('d', map(float.__add__, queue_areas[::2], queue_areas[1::2]))
+        self._busy_areas = array('d', map(float.__add__, busy_areas[::2], busy_areas[1::2]))
+        self.width *= 2
+
+    def finish(self):
+        """Bring the integrals up to the current simulation time."""
+        now = self.env.now
+        if now > self._state[0]:
+            self._advance(now)
+            self._state[0] = now
+
+    @property
+    def max_queue(self):
+        return self._state[3]
+
+    @property
+    def elapsed(self):
+        return self._state[0] - self.start
+
+    @property
+    def queue_area(self):
+        return sum(self._queue_areas) + self._state[4]
+
+    @property
+    def busy_area(self):
+        return sum(self._busy_areas) + self._state[5]
+
+    @property
+    def mean_queue(self):
+        return self.queue_area / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def utilization(self):
+        return self.busy_area / (self.capacity * self.elapsed) if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return {'mean_queue': self.mean_queue, 'max_queue': self.max_queue,
+                'utilization': self.utilization, 'elapsed': self.elapsed}
+
+    def series(self):
+        """(start times, mean queue lengths, utilizations) of the downsampled intervals."""
+        queue_areas = list(self._queue_areas) + [self._state[4]]
+        busy_areas = list(self._busy_areas) + [self._state[5]]
+        times, queues, utilizations = [], [], []
+        for index, (queue_area, busy_area) in enumerate(zip(queue_areas, busy_areas)):
+            begin = self.start + index * self.width
+            length = min(self.width, self._state[0] - begin)
+            if length <= 0:
+                break
+            times.append(begin)
+            queues.append(queue_area / length)
+            utilizations.append(busy_area / (self.capacity * length))
+        return times, queues, utilizations
+
+
+def attach(warehouse, max_points=1024, horizon=None):
+    """Monitor the Check, Cover and Deliver resources of `warehouse`, by stage name.
+
+    An expected `horizon` sizes the intervals up front, so they rarely need
+    merging while the run is hot.
+    """
+    width = horizon / max_points if horizon else 1.0
+    return {
+        'check': ResourceMonitor(warehouse.checkers, max_points, width),
+        'cover': ResourceMonitor(warehouse.coverers, max_points, width),
+        'deliver': ResourceMonitor(warehouse.deliverers, max_points, width),
+    }
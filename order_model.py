@@ -0,0 +1,169 @@
+from array import array
+
+# Order states
+STATES = ('start', 'process', 'waiting', 'done', 'cancelled')
+START, PROCESS, WAITING, DONE, CANCELLED = range(len(STATES))
+
+
+class Catalog:
+    """Interned SKUs: each name gets one integer id and one price.
+
+    Ids are dense, so per-SKU data lives in flat arrays. A catalogue built from
+    an inventory.Inventory uses the same slot numbers, so basket lines can be
+    used with both; it copies the inventory's SKUs and cannot intern new ones,
+    which would have no stock slot.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.names = []
+        self.prices = array('d')
+        self.frozen = False
+
+    @classmethod
+    def from_inventory(cls, inventory, prices):
+        catalog = cls()
+        catalog.index = dict(inventory.index)
+        catalog.names = list(inventory.names)
+        catalog.prices = array('d', prices)
+        catalog.frozen = True
+        if len(catalog.prices) != len(catalog.names):
+            raise ValueError("need one price per inventory SKU")
+        return catalog
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name, price=1.0):
+        """Id of `name`, adding it (at `price`) if it is new."""
+        sku = self.index.get(name)
+        if sku is None:
+            if self.frozen:
+                raise ValueError(f"unknown SKU {name!r}; this catalogue follows an inventory's slots")
+            sku = len(self.names)
+            self.index[name] = sku
+            self.names.append(name)
+            self.prices.append(price)
+        return sku
+
+    def item(self, name):
+        sku = self.index[name]
+        return Item(sku, name, self.prices[sku])
+
+
+class Item:
+    """One SKU; equal and hashable by name, so a SKU is one dict key however often it is built."""
+
+    __slots__ = ('sku', 'name', 'price')
+
+    def __init__(self, sku, name, price=1.0):
+        self.sku = sku
+        self.name = name
+        self.price = price
+
+    def __eq__(self, other):
+        return isinstance(other, Item) and self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return f"Item({self.name!r}, price={self.price})"
+
+
+class Order:
+    """An order as {sku id: quantity} lines with an incrementally kept total."""
+
+    __slots__ = ('order_id', 'catalog', 'lines', 'total', 'state', 'stage')
+
+    def __init__(self, order_id, catalog, lines=None):
+        self.order_id = order_id
+        self.catalog = catalog
+        self.lines = {}
+        self.total = 0.0
+        self.state = START
+        self.stage = None
+        if lines:
+            for sku, quantity in lines:
+                self.add(sku, quantity)
+
+    def add(self, sku, quantity=1):
+        self.lines[sku] = self.lines.get(sku, 0) + quantity
+        self.total += self.catalog.prices[sku] * quantity
+
+    def remove(self, sku, quantity=1):
+        """Remove `quantity` units of `sku`; False, leaving the order as it was, if it has fewer."""
+        have = self.lines.get(sku)
+        if have is None or have < quantity:
+            return False
+        if have == quantity:
+            del self.lines[sku]
+        else:
+            self.lines[sku] = have - quantity
+        self.total -= self.catalog.prices[sku] * quantity
+        return True
+
+    def basket(self):
+        """(sku, quantity) lines, as used by inventory.Inventory.reserve."""
+        return list(self.lines.items())
+
+    def __repr__(self):
+        return (f"Order(#{self.order_id}, {STATES[self.state]}, total={self.total:.2f}, "
+                f"lines={len(self.lines)})")
+
+
+class OrderTable:
+    """Columnar store for millions of orders.
+
+    Orders are rows of flat arrays; their lines are concatenated in
+    `line_skus`/`line_quantities`, with row i owning
+    line_offsets[i]:line_offsets[i + 1]. Each order costs about 25 bytes plus
+    8 bytes per line, instead of a Python object with a dict of lines.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.order_ids = array('q')
+        self.line_offsets = array('q', [0])
+        self.line_skus = array('i')
+        self.line_quantities = array('i')
+        self.totals = array('d')
+        self.states = array('b')
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    def append(self, order_id, lines):
+        """Add an order given as (sku, quantity) lines; returns its row."""
+        prices = self.catalog.prices
+        total = 0.0
+        for sku, quantity in lines:
+            self.line_skus.append(sku)
+            self.line_quantities.append(quantity)
+            total += prices[sku] * quantity
+        self.order_ids.append(order_id)
+        self.line_offsets.append(len(self.line_skus))
+        self.totals.append(total)
+        self.states.append(START)
+        return len(self.order_ids) - 1
+
+    @classmethod
+    def from_baskets(cls, catalog, baskets, first_order_id=0):
+        """Bulk constructor from an iterable of (sku, quantity) line lists."""
+        table = cls(catalog)
+        for offset, lines in enumerate(baskets):
+            table.append(first_order_id + offset, lines)
+        return table
+
+    def lines(self, row):
+        start, end = self.line_offsets[row], self.line_offsets[row + 1]
+        return list(zip(self.line_skus[start:end], self.line_quantities[start:end]))
+
+    def set_state(self, row, state):
+        self.states[row] = state
+
+    def order(self, row):
+        """Materialize one row as an Order object."""
+        order = Order(self.order_ids[row], self.catalog, self.lines(row))
+        order.state = self.states[row]
+        return order
@@ -0,0 +1,71 @@
+from matplotlib.figure import Figure
+
+from streaming_stats import as_tally
+
+
+def plot_hist(data, ax, title):
+    histogram = as_tally(data).histogram
+    # Drop the empty tail of the fixed bins
+    used = max([i + 1 for i, count in enumerate(histogram.counts) if count] or [0])
+    ax.bar(histogram.edges()[:used], histogram.counts[:used], width=histogram.width, align='edge',
+           color='skyblue', edgecolor='black')
+    ax.set_title(title)
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Frequency')
+
+
+def plot_monitors(monitors, queue_ax, utilization_ax):
+    for stage, monitor in monitors.items():
+        times, queues, utilizations = monitor.series()
+        queue_ax.step(times, queues, where='post', label=stage.capitalize())
+        utilization_ax.step(times, utilizations, where='post', label=stage.capitalize())
+    queue_ax.set_title('Queue Length')
+    queue_ax.set_xlabel('Time')
+    queue_ax.set_ylabel('Orders waiting')
+    queue_ax.legend()
+    utilization_ax.set_title('Utilization')
+    utilization_ax.set_xlabel('Time')
+    utilization_ax.set_ylabel('Busy fraction')
+    utilization_ax.set_ylim(0, 1.05)
+    utilization_ax.legend()
+
+
+def results_figure(results, fig=None):
+    """Histograms (and monitors) of `results` on `fig`, a new pyplot-free Figure by default.
+
+    Only the Tally bins are drawn, so the cost does not grow with the run.
+    """
+    stats = results.stats
+    if fig is None:
+        fig = Figure(figsize=(15, 12))
+    axs = fig.subplots(3, 3)
+    fig.suptitle('Warehouse Order Processing Times')
+
+    plot_hist(stats['check_waits'], axs[0, 0], 'Check Wait Times')
+    plot_hist(stats['check_services'], axs[0, 1], 'Check Service Times')
+
+    plot_hist(stats['cover_waits'], axs[1, 0], 'Cover Wait Times')
+    plot_hist(stats['cover_services'], axs[1, 1], 'Cover Service Times')
+
+    plot_hist(stats['deliver_waits'], axs[2, 0], 'Deliver Wait Times')
+    plot_hist(stats['deliver_services'], axs[2, 1], 'Deliver Service Times')
+    plot_hist(stats['total_times'], axs[2, 2], 'Total Time in System')
+
+    if results.monitors:
+        plot_monitors(results.monitors, axs[0, 2], axs[1, 2])
+    else:
+        axs[0, 2].axis('off')  # empty plot for symmetry
+        axs[1, 2].axis('off')
+
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    return fig
+
+
+def plot_results(results, show=True):
+    # pyplot is only needed for an interactive window
+    import matplotlib.pyplot as plt
+
+    fig = results_figure(results, plt.figure(figsize=(15, 12)))
+    if show:
+        plt.show()
+    return fig
@@ -0,0 +1,157 @@
+import cProfile
+import io
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+
+from events import ARRIVED, DELIVER, FINISHED, KINDS, STAGES, STARTED, NullSink
+
+# SimConfig.profile values
+PROFILERS = ('off', 'cprofile', 'tracemalloc')
+
+# emit's `time` argument shadows the module there
+time_counter = time.perf_counter
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class RunMetrics(NullSink):
+    """Sink that measures the run it is attached to and passes events on to `sink`.
+
+    Counts events per (stage, kind), tracks the high-water marks of the event
+    calendar, of each stage queue and of the orders in flight, and times the
+    wrapped sink, so the cost of user callbacks can be told apart from the
+    engine's. Queue lengths follow from the events alone: an order waits at a
+    stage from the event that brings it there until it starts.
+    """
+
+    level = 'counters'
+
+    def __init__(self, sink=None):
+        self.sink = None if sink is None or type(sink) is NullSink else sink
+        self.calendar = ()  # the engine's event list, set by simulation.run
+        self.counts = [0] * (len(STAGES) * len(KINDS))
+        self.queues = [0] * len(STAGES)  # orders waiting, by stage
+        self.max_queues = [0] * len(STAGES)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_calendar = 0
+        self.callback_seconds = 0.0
+
+    def emit(self, time, order_id, stage, kind):
+        self.counts[stage * len(KINDS) + kind] += 1
+        depth = len(self.calendar)
+        if depth > self.max_calendar:
+            self.max_calendar = depth
+        if kind == STARTED:
+            self.queues[stage] -= 1
+        elif kind == ARRIVED or (kind == FINISHED and stage != DELIVER):
+            # Arrivals join Check, finished orders the next stage
+            waiting = self.queues[stage + 1] = self.queues[stage + 1] + 1
+            if waiting > self.max_queues[stage + 1]:
+                self.max_queues[stage + 1] = waiting
+            if kind == ARRIVED:
+                self.in_flight += 1
+                if self.in_flight > self.max_in_flight:
+                    self.max_in_flight = self.in_flight
+        else:
+            self.in_flight -= 1
+        if self.sink is not None:
+            start = time_counter()
+            self.sink.emit(time, order_id, stage, kind)
+            self.callback_seconds += time_counter() - start
+
+    def flush(self):
+        if self.sink is not None:
+            start = time_counter()
+            self.sink.flush()
+            self.callback_seconds += time_counter() - start
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+    def summary(self):
+        events = {f"{STAGES[i // len(KINDS)]} {KINDS[i % len(KINDS)]}": count
+                  for i, count in enumerate(self.counts) if count}
+        return {
+            'events': sum(self.counts),
+            'events_by_kind': events,
+            'callback_seconds': self.callback_seconds,
+            'max_calendar': self.max_calendar,
+            'max_queues': {STAGES[stage]: self.max_queues[stage] for stage in range(1, len(STAGES))},
+            'max_in_flight': self.max_in_flight,
+        }
+
+
+def profiled_run(run, config, sink=None, trace=None, inventory=None, arrivals=None, variates=None):
+    """Call `run` (simulation._run) under the instrumentation `config` asks for.
+
+    Returns its SimResults with `metrics` set: wall and CPU time, events per
+    wall second, callback versus engine time, high-water marks and peak RSS
+    growth (with `config.metrics`), plus the cProfile listing or tracemalloc
+    top allocations (with `config.profile`).
+    """
+    if config.profile not in PROFILERS:
+        raise ValueError(f"unknown profiler {config.profile!r}, expected one of {PROFILERS}")
+    # The numpy engine has no events to count; it only gets the timings
+    metrics = RunMetrics(sink) if config.metrics and config.engine != "numpy" else None
+    profiler = cProfile.Profile() if config.profile == 'cprofile' else None
+    if config.profile == 'tracemalloc':
+        tracemalloc.start()
+    rss = peak_rss_mb()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        results = run(config, sink if metrics is None else metrics, trace, inventory, arrivals, variates, metrics)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        if config.profile == 'tracemalloc':
+            snapshot = tracemalloc.take_snapshot()
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    report = {'wall_seconds': wall, 'cpu_seconds': cpu, 'peak_rss_growth_mb': peak_rss_mb() - rss}
+    if metrics is not None:
+        report.update(metrics.summary())
+        report['events_per_second'] = report['events'] / wall if wall > 0 else 0.0
+        report['engine_seconds'] = wall - report['callback_seconds']
+    if profiler is not None:
+        listing = io.StringIO()
+        pstats.Stats(profiler, stream=listing).sort_stats('cumulative').print_stats(25)
+        report['profile'] = listing.getvalue()
+    if config.profile == 'tracemalloc':
+        report['traced_mb'] = traced / 2**20
+        report['traced_peak_mb'] = traced_peak / 2**20
+        report['top_allocations'] = [str(stat) for stat in snapshot.statistics('lineno')[:10]]
+    results.metrics = report
+    return results
+
+
+def print_metrics(metrics):
+    print("\n--- Run Metrics ---")
+    print(f"Wall time: {metrics['wall_seconds']:.3f}s, CPU time: {metrics['cpu_seconds']:.3f}s, "
+          f"peak RSS growth: {metrics['peak_rss_growth_mb']:.1f} MB")
+    if 'events' in metrics:
+        print(f"Events: {metrics['events']} ({metrics['events_per_second']:,.0f}/s); "
+              + ", ".join(f"{kind}={count}" for kind, count in metrics['events_by_kind'].items()))
+        print(f"Engine: {metrics['engine_seconds']:.3f}s, sink callbacks: {metrics['callback_seconds']:.3f}s")
+        print(f"High-water marks: calendar={metrics['max_calendar']}, in flight={metrics['max_in_flight']}, "
+              + ", ".join(f"{stage} queue={depth}" for stage, depth in metrics['max_queues'].items()))
+    if 'traced_peak_mb' in metrics:
+        print(f"Traced memory: {metrics['traced_mb']:.1f} MB, peak {metrics['traced_peak_mb']:.1f} MB")
+        for line in metrics['top_allocations']:
+            print(f"  {line}")
+    if 'profile' in metrics:
+        print(metrics['profile'])
@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import time
+
+import simulation
+from events import ARRIVED, CANCELLED, CHECK, COVER, DELIVER, FINISHED, ORDER, STARTED, ConsoleSink, CounterSink, NullSink
+from inventory import random_basket
+from streams import make_streams
+
+
+class RealtimeWarehouse:
+    """The Check -> Cover -> Deliver pipeline played out against the wall clock.
+
+    Every employee is a coroutine pulling orders from its stage's
+    asyncio.Queue, so thousands of them share one thread. One model time unit
+    lasts `unit` seconds divided by `speed`: 1 plays the model live, 1000
+    runs it a thousand times faster. Every wake-up is scheduled for an
+    absolute model time, so a late timer does not delay the events after it,
+    and the stats hold the drawn services and the scheduled times; how late
+    the timers fired is kept apart in `max_lag`.
+    """
+
+    def __init__(self, config=simulation.SimConfig(), speed=1.0, unit=1.0, sink=None, inventory=None):
+        self.config = config
+        self.scale = unit / speed  # wall seconds per model time unit
+        self.sink = sink if sink is not None else NullSink()
+        self.inventory = inventory
+        streams = make_streams(config.seed, config.streams, config.antithetic)
+        self.arrival_rng = streams['arrival']
+        self.availability_rng = streams['availability']
+        self.basket_rng = streams['basket']
+        self.stages = (
+            (CHECK, config.check_employees, streams['check'], config.check_time_mean),
+            (COVER, config.cover_employees, streams['cover'], config.cover_time_mean),
+            (DELIVER, config.deliver_employees, streams['deliver'], config.deliver_time_mean),
+        )
+        self.stats = simulation.new_stats(config.keep_samples)
+        self._stopped = None
+        self._loop = None
+        self._start = None
+        self.max_lag = 0.0  # model time units the latest wake-up came after its deadline
+
+    @property
+    def now(self):
+        """Model time since the run started."""
+        return (self._loop.time() - self._start) / self.scale
+
+    async def _sleep_until(self, model_time):
+        delay = self._start + model_time * self.scale - self._loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag = self.now - model_time
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    def stop(self):
+        """End the run early; safe to call from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _generate(self, queue):
+        config = self.config
+        now = 0.0
+        for order_id in range(config.num_orders):
+            now += self.arrival_rng.expovariate(1/config.interarrival_mean)
+            await self._sleep_until(now)
+            basket = None
+            if self.inventory is not None:
+                basket = random_basket(self.basket_rng, self.inventory, config.max_basket_lines)
+            self.sink.emit(now, order_id, ORDER, ARRIVED)
+            # order_id, arrival, queue entry, basket, then wait and service per stage
+            queue.put_nowait([order_id, now, now, basket])
+
+    async def _employee(self, stage, rng, mean, queue, next_queue):
+        emit = self.sink.emit
+        stats = self.stats
+        config = self.config
+        free = 0.0  # model time this employee finished its last order
+        while True:
+            order = await queue.get()
+            # The order starts when it is queued or when the employee is free, whichever is later
+            started = max(order[2], free)
+            order.append(started - order[2])
+            emit(started, order[0], stage, STARTED)
+            service = rng.expovariate(1/mean)
+            now = free = started + service
+            await self._sleep_until(now)
+            order.append(service)
+            if stage == CHECK:
+                if self.inventory is None:
+                    available = self.availability_rng.random() < config.item_availability
+                else:
+                    available = self.inventory.reserve(order[3])
+                if not available:
+                    emit(now, order[0], CHECK, CANCELLED)
+                    stats['orders_cancelled'] += 1
+                    self._finished()
+                    continue
+            emit(now, order[0], stage, FINISHED)
+            if next_queue is not None:
+                order[2] = now
+                next_queue.put_nowait(order)
+                continue
+
+            _, arrival, _, _, check_wait, check_service, cover_wait, cover_service, deliver_wait, deliver_service = order
+            stats['check_waits'].append(check_wait)
+            stats['check_services'].append(check_service)
+            stats['cover_waits'].append(cover_wait)
+            stats['cover_services'].append(cover_service)
+            stats['deliver_waits'].append(deliver_wait)
+            stats['deliver_services'].append(deliver_service)
+            stats['total_times'].append(now - arrival)
+            stats['orders_completed'] += 1
+            self._finished()
+
+    def _finished(self):
+        if self.stats['orders_completed'] + self.stats['orders_cancelled'] == self.config.num_orders:
+            self._stopped.set()
+
+    async def run(self):
+        """Play the run until every order is done, `config.sim_time` model time has passed or `stop` is called."""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._start = self._loop.time()
+        queues = [asyncio.Queue() for _ in self.stages]
+        tasks = [asyncio.create_task(self._generate(queues[0]))]
+        for index, (stage, employees, rng, mean) in enumerate(self.stages):
+            next_queue = queues[index + 1] if index + 1 < len(queues) else None
+            tasks += [asyncio.create_task(self._employee(stage, rng, mean, queues[index], next_queue))
+                      for _ in range(employees)]
+        if self.config.num_orders == 0:
+            self._stopped.set()
+        horizon = None if self.config.sim_time is None else self.config.sim_time * self.scale
+        try:
+            await asyncio.wait_for(self._stopped.wait(), horizon)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Cancelling wakes every employee at once, wherever it is waiting
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.sink.flush()
+        return simulation.SimResults(self.config, self.stats)
+
+
+def run_realtime(config=simulation.SimConfig(), speed=1.0, unit=1.0, sink=None, inventory=None):
+    """Run `config` in real time, `speed` times faster than live, and return its SimResults."""
+    return asyncio.run(RealtimeWarehouse(config, speed, unit, sink, inventory).run())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play the order pipeline in (accelerated) real time.")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression: 1 is live, 1000 is 1000x faster")
+    parser.add_argument("--unit", type=float, default=1.0, help="wall seconds per model time unit at speed 1")
+    parser.add_argument("--staffing", type=int, nargs=3, metavar=("CHECK", "COVER", "DELIVER"),
+                        default=simulation.SimConfig().staffing)
+    parser.add_argument("--interarrival-mean", type=float, default=simulation.INTERARRIVAL_MEAN)
+    parser.add_argument("--orders", type=int, default=simulation.NUM_ORDERS)
+    parser.add_argument("--sim-time", type=float, default=simulation.SIM_TIME,
+                        help="model time to run for; 0 runs until every order is done")
+    parser.add_argument("--seed", type=int, default=simulation.RANDOM_SEED)
+    parser.add_argument("--quiet", action="store_true", help="do not print the per-order event log")
+    args = parser.parse_args()
+
+    config = simulation.SimConfig(num_orders=args.orders, sim_time=args.sim_time or None, seed=args.seed,
+                                  interarrival_mean=args.interarrival_mean).with_staffing(args.staffing)
+    sink = CounterSink() if args.quiet else ConsoleSink()
+    warehouse = RealtimeWarehouse(config, args.speed, args.unit, sink)
+    started = time.perf_counter()
+    try:
+        results = asyncio.run(warehouse.run())
+    except KeyboardInterrupt:
+        raise SystemExit("interrupted")
+    simulation.print_summary(results)
+    print(f"Wall time: {time.perf_counter() - started:.2f}s, timers up to {warehouse.max_lag:.3f} model time units late")
@@ -0,0 +1,176 @@
+import argparse
+import math
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import simulation
+from streaming_stats import as_tally
+
+
+def replication_seed(seed, index, branch=0):
+    """Seed of replication `index`: its own child of the root seed sequence.
+
+    The child depends only on (seed, index), so the streams do not change with
+    the number of workers or the order in which replications are scheduled.
+    A non-zero `branch` gives another independent seed for the same index.
+    """
+    child = np.random.SeedSequence(seed, spawn_key=(index, branch) if branch else (index,))
+    return int.from_bytes(child.generate_state(4).tobytes(), 'little')
+
+
+def summarize(stats):
+    # Mean and upper percentiles of every stats series, plus the counters
+    summary = {}
+    for name in simulation.SERIES:
+        tally = as_tally(stats[name])
+        summary[name] = tally.mean
+        for q in (50, 95, 99):
+            summary[f'{name}_p{q}'] = tally.quantile(q / 100)
+    summary['orders_completed'] = stats['orders_completed']
+    summary['orders_cancelled'] = stats['orders_cancelled']
+    return summary
+
+
+def replicate(index, config=simulation.SimConfig(), cache=None):
+    # `cache` is the path of a result_cache database; replications already in it are not rerun
+    config = config.replace(seed=replication_seed(config.seed, index))
+    if cache is None:
+        results = simulation.run(config)
+    else:
+        from result_cache import cached_run
+        results = cached_run(config, cache)
+    return summarize(results.stats)
+
+
+def replicate_pair(index, config_a, config_b, antithetic=False, common_random_numbers=True):
+    """Summaries of replication `index` of two scenarios.
+
+    With common random numbers both scenarios run on the same seed. With
+    `antithetic`, each summary is the average of the plain run and its
+    antithetic twin.
+    """
+    seeds = (replication_seed(config_a.seed, index),
+             replication_seed(config_a.seed, index, branch=0 if common_random_numbers else 1))
+    pair = []
+    for config, seed in zip((config_a, config_b), seeds):
+        summary = summarize(simulation.run(config.replace(seed=seed)).stats)
+        if antithetic:
+            twin = summarize(simulation.run(config.replace(seed=seed, antithetic=True)).stats)
+            summary = {name: (summary[name] + twin[name]) / 2 for name in summary}
+        pair.append(summary)
+    return pair
+
+
+def t_quantile(p, df):
+    """Quantile of Student's t distribution (Cornish-Fisher expansion)."""
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = statistics.NormalDist().inv_cdf(p)
+    z2 = z * z
+    return (z
+            + z * (z2 + 1) / (4 * df)
+            + z * ((5 * z2 + 16) * z2 + 3) / (96 * df ** 2)
+            + z * (((3 * z2 + 19) * z2 + 17) * z2 - 15) / (384 * df ** 3)
+            + z * ((((79 * z2 + 776) * z2 + 1482) * z2 - 1920) * z2 - 945) / (92160 * df ** 4))
+
+
+def confidence_interval(values, confidence=0.95):
+    values = [v for v in values if not math.isnan(v)]
+    n = len(values)
+    mean = statistics.fmean(values) if n > 0 else math.nan
+    if n > 1:
+        half_width = t_quantile(0.5 + confidence / 2, n - 1) * statistics.stdev(values) / math.sqrt(n)
+    else:
+        half_width = math.inf
+    return {'mean': mean, 'half_width': half_width,
+            'low': mean - half_width, 'high': mean + half_width, 'n': n}
+
+
+def merge(summaries, confidence=0.95):
+    """Mean and confidence interval across replications for every stats series."""
+    return {name: confidence_interval([s[name] for s in summaries], confidence)
+            for name in summaries[0]}
+
+
+def run_replications(n, config=simulation.SimConfig(), workers=None, confidence=0.95, first=0, pool=None,
+                     cache=None):
+    """Run replications `first` .. `first + n - 1` over a process pool.
+
+    Pass an existing `pool` to reuse its workers across calls, and the path of
+    a result_cache database as `cache` to reuse earlier runs.
+    Returns the per-replication summaries (in index order) and their merge.
+    """
+    indices = range(first, first + n)
+    chunksize = max(1, n // (4 * (workers or os.cpu_count() or 1)))
+    if pool is not None:
+        summaries = list(pool.map(replicate, indices, [config] * n, [cache] * n, chunksize=chunksize))
+    elif workers == 1:
+        summaries = [replicate(i, config, cache) for i in indices]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = list(pool.map(replicate, indices, [config] * n, [cache] * n, chunksize=chunksize))
+    return summaries, merge(summaries, confidence)
+
+
+def compare_scenarios(config_a, config_b, n, metric='total_times', antithetic=False,
+                      common_random_numbers=True, workers=None, confidence=0.95):
+    """Estimate `metric` of scenario B minus scenario A from `n` paired replications.
+
+    Common random numbers run every source of randomness on its own stream
+    (SimConfig.streams = "per_source"), so both scenarios see the same arrivals,
+    service times and availability draws and the difference is not swamped by
+    noise. `variance_reduction` is how many times smaller the variance of the
+    paired difference is than that of two independent estimates; it is the
+    factor by which fewer replications reach the same precision.
+    """
+    if common_random_numbers:
+        config_a = config_a.replace(streams="per_source")
+        config_b = config_b.replace(streams="per_source")
+    args = (range(n), [config_a] * n, [config_b] * n, [antithetic] * n, [common_random_numbers] * n)
+    if workers == 1:
+        pairs = list(map(replicate_pair, *args))
+    else:
+        chunksize = max(1, n // (4 * (workers or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pairs = list(pool.map(replicate_pair, *args, chunksize=chunksize))
+
+    pairs = [(a[metric], b[metric]) for a, b in pairs if not (math.isnan(a[metric]) or math.isnan(b[metric]))]
+    a_values = [a for a, _ in pairs]
+    b_values = [b for _, b in pairs]
+    differences = [b - a for a, b in pairs]
+    difference_variance = statistics.variance(differences) if len(differences) > 1 else math.nan
+    independent_variance = (statistics.variance(a_values) + statistics.variance(b_values)
+                            if len(pairs) > 1 else math.nan)
+    return {
+        'a': confidence_interval(a_values, confidence),
+        'b': confidence_interval(b_values, confidence),
+        'difference': confidence_interval(differences, confidence),
+        'variance_reduction': independent_variance / difference_variance if difference_variance else math.inf,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run independent replications of the warehouse model.")
+    parser.add_argument("replications", type=int)
+    parser.add_argument("--seed", type=int, default=simulation.RANDOM_SEED)
+    parser.add_argument("--engine", choices=simulation.ENGINES, default=simulation.ENGINE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--cache", nargs="?", const="", metavar="PATH",
+                        help="reuse and store results in a result cache (default location without PATH)")
+    args = parser.parse_args()
+
+    cache = args.cache
+    if cache == "":
+        from result_cache import DEFAULT_PATH
+        cache = DEFAULT_PATH
+    config = simulation.SimConfig(seed=args.seed, engine=args.engine)
+    _, merged = run_replications(args.replications, config, args.workers, args.confidence, cache=cache)
+    print(f"--- {args.replications} replications, {args.confidence:.0%} confidence intervals ---")
+    for name, ci in merged.items():
+        print(f"{name}: mean={ci['mean']:.2f} +/- {ci['half_width']:.2f} (n={ci['n']})")
@@ -0,0 +1,89 @@
+import html
+import io
+import os
+import time
+
+import simulation
+from plotting import results_figure
+from streaming_stats import as_tally
+
+FORMATS = ('png', 'svg', 'html')
+
+SERIES_NAMES = {
+    'check_waits': 'Check Wait Time',
+    'check_services': 'Check Service Time',
+    'cover_waits': 'Cover Wait Time',
+    'cover_services': 'Cover Service Time',
+    'deliver_waits': 'Deliver Wait Time',
+    'deliver_services': 'Deliver Service Time',
+    'total_times': 'Total Time in System',
+}
+COLUMNS = ('count', 'mean', 'stdev', 'min', 'p50', 'p95', 'p99', 'max')
+
+
+def summary_rows(results):
+    """One (name, count, mean, stdev, min, p50, p95, p99, max) row per stats series."""
+    rows = []
+    for name in simulation.SERIES:
+        tally = as_tally(results.stats[name])
+        rows.append((SERIES_NAMES[name], tally.count, tally.mean, tally.stdev, tally.min,
+                     tally.quantile(0.5), tally.quantile(0.95), tally.quantile(0.99), tally.max))
+    return rows
+
+
+def _table(header, rows):
+    def cell(value):
+        return f"{value:.2f}" if isinstance(value, float) else html.escape(str(value))
+    head = "".join(f"<th>{html.escape(name)}</th>" for name in header)
+    body = "".join("<tr>" + "".join(f"<td>{cell(value)}</td>" for value in row) + "</tr>" for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def render_html(results, title="Warehouse Order Simulation"):
+    """Self-contained HTML page: config, counters, summary table and the figure as inline SVG."""
+    svg = io.StringIO()
+    results_figure(results).savefig(svg, format='svg')
+    # Drop the XML prolog and doctype; the <svg> element embeds as is
+    figure = svg.getvalue()
+    figure = figure[figure.index('<svg'):]
+    stats = results.stats
+    sections = [
+        f"<h1>{html.escape(title)}</h1>",
+        f"<p>Generated {time.strftime('%Y-%m-%d %H:%M:%S')}</p>",
+        "<h2>Orders</h2>",
+        _table(('completed', 'cancelled'), [(stats['orders_completed'], stats['orders_cancelled'])]),
+        "<h2>Times</h2>",
+        _table(('series',) + COLUMNS, summary_rows(results)),
+    ]
+    if results.monitors:
+        sections += ["<h2>Stages</h2>", _table(
+            ('stage', 'mean queue', 'max queue', 'utilization'),
+            [(stage, monitor.mean_queue, monitor.max_queue, f"{monitor.utilization:.1%}")
+             for stage, monitor in results.monitors.items()])]
+    if results.config is not None:
+        fields = vars(results.config)
+        sections += ["<h2>Configuration</h2>", _table(('setting', 'value'), sorted(fields.items()))]
+    sections += ["<h2>Distributions</h2>", figure]
+    style = ("body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1em}"
+             "td,th{border:1px solid #ccc;padding:2px 8px;text-align:right}svg{max-width:100%;height:auto}")
+    return (f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<style>{style}</style></head><body>\n" + "\n".join(sections) + "\n</body></html>\n")
+
+
+def write_report(results, path, format=None, title="Warehouse Order Simulation"):
+    """Write `results` to `path` as a PNG or SVG figure or an HTML report; no display needed.
+
+    The format defaults to the file extension. Only the Tally bins and
+    summaries are drawn, so a report takes as long for 100 orders as for 100
+    million.
+    """
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in FORMATS:
+        raise ValueError(f"unknown report format {format!r}, expected one of {FORMATS}")
+    if format == 'html':
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render_html(results, title))
+    else:
+        results_figure(results).savefig(path, format=format)
+    return path
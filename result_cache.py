@@ -0,0 +1,187 @@
+import argparse
+import dataclasses
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import sqlite3
+import time
+from importlib.metadata import PackageNotFoundError, version
+
+import simulation
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "order-simulation", "results.sqlite")
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# Modules whose source decides what a run returns; editing any of them invalidates the cache
+MODEL_MODULES = ('simulation', 'event_kernel', 'vectorized', 'streams', 'streaming_stats', 'events', 'inventory')
+
+# Config fields that add to a run's results without changing its stats; they are left out of the key
+INSTRUMENT_FIELDS = ('monitor', 'metrics', 'profile')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+@functools.cache
+def code_version():
+    """Fingerprint of the model source and of the simpy and numpy versions it runs on."""
+    digest = hashlib.sha256()
+    for name in MODEL_MODULES:
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            digest.update(f.read())
+    for name in ('simpy', 'numpy'):
+        try:
+            digest.update(f"{name}={version(name)}".encode())
+        except PackageNotFoundError:
+            digest.update(f"{name}=none".encode())
+    return digest.hexdigest()[:16]
+
+
+def cacheable(config):
+    """Whether a run of `config` can be replayed from its stats.
+
+    Not when it is unseeded, which asks for a fresh random run, nor when it
+    asks for monitors, metrics or a profile, which are not stored.
+    """
+    return (config.seed is not None and not config.monitor and not config.metrics
+            and config.profile == "off")
+
+
+def config_text(config):
+    # Canonical JSON: every field but the instrumentation, sorted, so equal configs give equal text
+    fields = dataclasses.asdict(config)
+    for name in INSTRUMENT_FIELDS:
+        del fields[name]
+    return json.dumps(fields, sort_keys=True, separators=(',', ':'))
+
+
+def config_key(config, version=None):
+    text = f"{version or code_version()}/{config_text(config)}"
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """Stats of finished runs in a SQLite file, keyed by config and code version.
+
+    Only the stats dict is stored (no trace or monitors). Reads and writes are
+    short transactions in WAL mode, so processes of a pool can share one
+    file; writers wait up to `timeout` seconds for each other. When the stored
+    results exceed `max_bytes`, the least recently used ones are dropped.
+    Entries of other code versions are never returned and age out the same way.
+    Configs that are not `cacheable` are never stored or looked up.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, timeout=30.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = code_version()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly below
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def get(self, config):
+        """Cached SimResults of `config`, or None."""
+        if not cacheable(config):
+            return None
+        key = config_key(config, self.version)
+        row = self.db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        return simulation.SimResults(config, pickle.loads(row[0]))
+
+    def put(self, config, results):
+        if not cacheable(config):
+            return
+        value = pickle.dumps(results.stats, protocol=pickle.HIGHEST_PROTOCOL)
+        db = self.db
+        # IMMEDIATE takes the write lock up front, so the size check and the
+        # eviction see no other writer in between
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                       (config_key(config, self.version), config_text(config), self.version,
+                        value, len(value), time.time()))
+            self._evict()
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _evict(self):
+        excess = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY used"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        self.db.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    def run(self, config):
+        """SimResults of `config`, simulated only if no cached result exists."""
+        if not cacheable(config):
+            return simulation.run(config)
+        results = self.get(config)
+        if results is None:
+            results = simulation.run(config)
+            self.put(config, results)
+        return results
+
+    def stats(self):
+        count, size, current = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(version = ?), 0) FROM results",
+            (self.version,)).fetchone()
+        return {'entries': count, 'bytes': size, 'current_version': current, 'version': self.version}
+
+    def clear(self):
+        self.db.execute("DELETE FROM results")
+        self.db.execute("VACUUM")
+
+    def close(self):
+        self.db.close()
+
+
+# One open cache per path and process, so pool workers reuse their connection
+_open = {}
+
+
+def cached_run(config, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    """simulation.run(config) through the cache at `path`; safe to call from pool workers."""
+    cache = _open.get(path)
+    if cache is None or cache.max_bytes != max_bytes:
+        cache = _open[path] = ResultCache(path, max_bytes)
+    return cache.run(config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the simulation result cache.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.path)
+    if args.clear:
+        cache.clear()
+    info = cache.stats()
+    print(f"{args.path}: {info['entries']} results ({info['current_version']} for code version "
+          f"{info['version']}), {info['bytes'] / 2**20:.1f} MB")
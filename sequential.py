@@ -0,0 +1,93 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import simulation
+from replications import merge, run_replications
+
+
+def relative_half_width(ci):
+    if ci['n'] < 2 or ci['mean'] == 0 or math.isnan(ci['mean']):
+        return math.inf
+    return ci['half_width'] / abs(ci['mean'])
+
+
+def run_until_precise(targets, config=simulation.SimConfig(), max_replications=2000,
+                      min_replications=10, confidence=0.95, workers=None):
+    """Add replications in parallel batches until every metric is precise enough.
+
+    `targets` maps summary names (e.g. 'total_times' for the mean total time,
+    'deliver_waits_p95' for the p95 deliver wait; see replications.summarize)
+    to a relative CI half-width. Stops once all of them are met or
+    `max_replications` have run. Each metric reports how many replications it
+    needed to first meet its target.
+    """
+    workers = workers or os.cpu_count() or 1
+    summaries = []
+    needed = {name: None for name in targets}
+    merged = {}
+    batch = max(min_replications, workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = min(batch, max_replications - len(summaries))
+            new, _ = run_replications(batch, config, workers, confidence, first=len(summaries), pool=pool)
+            summaries += new
+            merged = merge(summaries, confidence)
+            unknown = set(targets) - set(merged)
+            if unknown:
+                raise KeyError(f"unknown metrics {sorted(unknown)}")
+
+            for name, target in targets.items():
+                if needed[name] is None and relative_half_width(merged[name]) <= target:
+                    needed[name] = len(summaries)
+            pending = [name for name, target in targets.items()
+                       if relative_half_width(merged[name]) > target]
+            if not pending or len(summaries) >= max_replications:
+                break
+
+            # Half-widths shrink like 1/sqrt(n): size the next batch for the slowest metric,
+            # in whole rounds of workers
+            n = len(summaries)
+            estimate = max(n * (relative_half_width(merged[name]) / targets[name]) ** 2 for name in pending)
+            batch = max(workers, min(int(estimate) - n, n))
+            batch = math.ceil(batch / workers) * workers
+
+    return {
+        'replications': len(summaries),
+        'converged': not pending,
+        'metrics': {name: dict(merged[name], target=target,
+                               relative_half_width=relative_half_width(merged[name]),
+                               needed=needed[name])
+                    for name, target in targets.items()},
+        'summaries': summaries,
+    }
+
+
+def parse_target(text):
+    name, _, value = text.partition('=')
+    return name, float(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run replications until target CI widths are met.")
+    parser.add_argument("targets", nargs="+", type=parse_target,
+                        help="metric=relative half-width, e.g. total_times=0.01 deliver_waits_p95=0.05")
+    parser.add_argument("--max-replications", type=int, default=2000)
+    parser.add_argument("--min-replications", type=int, default=10)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=simulation.RANDOM_SEED)
+    parser.add_argument("--engine", choices=["simpy", "numpy"], default=simulation.ENGINE)
+    args = parser.parse_args()
+
+    config = simulation.SimConfig(seed=args.seed, engine=args.engine)
+    result = run_until_precise(dict(args.targets), config, args.max_replications,
+                               args.min_replications, args.confidence, args.workers)
+    status = "all targets met" if result['converged'] else "budget exhausted"
+    print(f"--- {result['replications']} replications, {status} ---")
+    for name, metric in result['metrics'].items():
+        needed = metric['needed'] if metric['needed'] is not None else "not reached"
+        print(f"{name}: mean={metric['mean']:.3f} +/- {metric['half_width']:.3f} "
+              f"({metric['relative_half_width']:.1%} vs target {metric['target']:.1%}), needed: {needed}")
@@ -1,7 +1,14 @@
+import argparse
+import dataclasses
+from dataclasses import dataclass
+from functools import partial
+
 import simpy
-import random
-import statistics
-import matplotlib.pyplot as plt
+
+from events import ARRIVED, CANCELLED, CHECK, COVER, DELIVER, FINISHED, ORDER, STARTED, ConsoleSink, NullSink, TeeSink
+from streaming_stats import Tally, as_tally
+from inventory import random_basket
+from streams import make_streams
 
 # Configuration
 CHECK_EMPLOYEES = 2
@@ -11,70 +18,167 @@ SIM_TIME = 100
 NUM_ORDERS = 50
 RANDOM_SEED = 4232
 
-random.seed(RANDOM_SEED)
+# Mean times of the exponential distributions
+INTERARRIVAL_MEAN = 6
+CHECK_TIME_MEAN = 5
+COVER_TIME_MEAN = 6
+DELIVER_TIME_MEAN = 5
+ITEM_AVAILABILITY = 0.8
+
+# "simpy" runs the process-based model below, "numpy" the array-based engine in vectorized.py
+# and "kernel" the event-calendar engine in event_kernel.py
+ENGINE = "simpy"
+ENGINES = ("simpy", "numpy", "kernel")
+
+@dataclass(frozen=True)
+class SimConfig:
+    check_employees: int = CHECK_EMPLOYEES
+    cover_employees: int = COVER_EMPLOYEES
+    deliver_employees: int = DELIVER_EMPLOYEES
+    interarrival_mean: float = INTERARRIVAL_MEAN
+    check_time_mean: float = CHECK_TIME_MEAN
+    cover_time_mean: float = COVER_TIME_MEAN
+    deliver_time_mean: float = DELIVER_TIME_MEAN
+    item_availability: float = ITEM_AVAILABILITY
+    sim_time: float | None = SIM_TIME  # None runs until every order is done
+    num_orders: int = NUM_ORDERS
+    seed: int = RANDOM_SEED
+    engine: str = ENGINE
+    keep_samples: bool = False  # keep every sample in lists instead of streaming tallies
+    streams: str = "shared"  # "per_source" gives each source of randomness its own stream
+    antithetic: bool = False  # draw 1 - u instead of u everywhere
+    max_basket_lines: int = 5  # basket size when orders are checked against an Inventory
+    monitor: bool = False  # time-weighted queue length and utilization of each stage (monitors.py)
+    metrics: bool = False  # event counts, callback time and high-water marks of the run (profiling.py)
+    profile: str = "off"  # "cprofile" or "tracemalloc" captures a profile of the run
+
+    @property
+    def staffing(self):
+        return (self.check_employees, self.cover_employees, self.deliver_employees)
+
+    def replace(self, **changes):
+        return dataclasses.replace(self, **changes)
+
+    def with_staffing(self, staffing):
+        check_employees, cover_employees, deliver_employees = staffing
+        return self.replace(check_employees=check_employees, cover_employees=cover_employees,
+                            deliver_employees=deliver_employees)
+
+@dataclass
+class SimResults:
+    config: SimConfig
+    stats: dict
+    trace: object = None  # trace_store.TraceStore, when one was requested
+    monitors: dict = None  # stage name -> monitors.ResourceMonitor, with config.monitor
+    metrics: dict = None  # profiling.profiled_run measurements, with config.metrics or config.profile
+
+    @property
+    def orders_completed(self):
+        return self.stats['orders_completed']
+
+    @property
+    def orders_cancelled(self):
+        return self.stats['orders_cancelled']
+
+    def __getitem__(self, name):
+        return self.stats[name]
 
 class Warehouse:
-    def __init__(self, env):
+    def __init__(self, env, config=SimConfig(), streams=None, sink=None, inventory=None, variates=None):
         self.env = env
-        self.checkers = simpy.Resource(env, capacity=CHECK_EMPLOYEES)
-        self.coverers = simpy.Resource(env, capacity=COVER_EMPLOYEES)
-        self.deliverers = simpy.Resource(env, capacity=DELIVER_EMPLOYEES)
+        self.config = config
+        if streams is None:
+            streams = make_streams(config.seed, config.streams, config.antithetic)
+        self.arrival_rng = streams['arrival']
+        self.check_rng = streams['check']
+        self.cover_rng = streams['cover']
+        self.deliver_rng = streams['deliver']
+        self.availability_rng = streams['availability']
+        self.sink = sink if sink is not None else NullSink()
+        self.inventory = inventory
+        self.basket_rng = streams['basket']
+        self.checkers = simpy.Resource(env, capacity=config.check_employees)
+        self.coverers = simpy.Resource(env, capacity=config.cover_employees)
+        self.deliverers = simpy.Resource(env, capacity=config.deliver_employees)
+        # Zero-argument draws; a variates.Variates replaces them with block-sampled ones
+        if variates is None:
+            self.draw_interarrival = partial(self.arrival_rng.expovariate, 1/config.interarrival_mean)
+            self.draw_check = partial(self.check_rng.expovariate, 1/config.check_time_mean)
+            self.draw_cover = partial(self.cover_rng.expovariate, 1/config.cover_time_mean)
+            self.draw_deliver = partial(self.deliver_rng.expovariate, 1/config.deliver_time_mean)
+            self.draw_availability = self.availability_rng.random
+        else:
+            self.draw_interarrival = variates['arrival']
+            self.draw_check = variates['check']
+            self.draw_cover = variates['cover']
+            self.draw_deliver = variates['deliver']
+            self.draw_availability = variates['availability']
 
-    def check_order(self, order_id):
-        check_time = random.expovariate(1/5)
+    def check_order(self, order_id, check_time=None):
+        if check_time is None:
+            check_time = self.draw_check()
         yield self.env.timeout(check_time)
 
-    def cover_order(self, order_id):
-        cover_time = random.expovariate(1/6)
+    def cover_order(self, order_id, cover_time=None):
+        if cover_time is None:
+            cover_time = self.draw_cover()
         yield self.env.timeout(cover_time)
 
-    def deliver_order(self, order_id):
-        deliver_time = random.expovariate(1/5)
+    def deliver_order(self, order_id, deliver_time=None):
+        if deliver_time is None:
+            deliver_time = self.draw_deliver()
         yield self.env.timeout(deliver_time)
 
-def order_process(env, order_id, warehouse, stats):
+def order_process(env, order_id, warehouse, stats, basket=None, services=None):
+    emit = warehouse.sink.emit
+    # Recorded (check, cover, deliver) times of a replayed order; None draws them
+    check_time, cover_time, deliver_time = services or (None, None, None)
     arrival_time = env.now
-    print(f"[{arrival_time:.2f}] Order {order_id} arrived.")
+    emit(arrival_time, order_id, ORDER, ARRIVED)
 
     # Check Stage
     with warehouse.checkers.request() as request:
         check_queue_enter = env.now
         yield request
         check_wait = env.now - check_queue_enter
-        print(f"[{env.now:.2f}] Order {order_id} checking started after waiting {check_wait:.2f}.")
+        emit(env.now, order_id, CHECK, STARTED)
         check_start = env.now
-        yield env.process(warehouse.check_order(order_id))
+        yield env.process(warehouse.check_order(order_id, check_time))
         check_service = env.now - check_start
 
-        # Randomly decide item availability (80% chance available)
-        item_available = random.random() < 0.8
+        if warehouse.inventory is None:
+            # Randomly decide item availability (80% chance available)
+            item_available = warehouse.draw_availability() < warehouse.config.item_availability
+        else:
+            # Take every line of the basket from stock, or none of them
+            item_available = warehouse.inventory.reserve(basket)
         if not item_available:
-            print(f"[{env.now:.2f}] Order {order_id} cancelled (item unavailable).")
+            emit(env.now, order_id, CHECK, CANCELLED)
             stats['orders_cancelled'] += 1
             return
-        print(f"[{env.now:.2f}] Order {order_id} passed checking.")
+        emit(env.now, order_id, CHECK, FINISHED)
 
     # Cover Stage
     with warehouse.coverers.request() as request:
         cover_queue_enter = env.now
         yield request
         cover_wait = env.now - cover_queue_enter
-        print(f"[{env.now:.2f}] Order {order_id} covering started after waiting {cover_wait:.2f}.")
+        emit(env.now, order_id, COVER, STARTED)
         cover_start = env.now
-        yield env.process(warehouse.cover_order(order_id))
+        yield env.process(warehouse.cover_order(order_id, cover_time))
         cover_service = env.now - cover_start
-        print(f"[{env.now:.2f}] Order {order_id} covered.")
+        emit(env.now, order_id, COVER, FINISHED)
 
     # Deliver Stage
     with warehouse.deliverers.request() as request:
         deliver_queue_enter = env.now
         yield request
         deliver_wait = env.now - deliver_queue_enter
-        print(f"[{env.now:.2f}] Order {order_id} delivering started after waiting {deliver_wait:.2f}.")
+        emit(env.now, order_id, DELIVER, STARTED)
         deliver_start = env.now
-        yield env.process(warehouse.deliver_order(order_id))
+        yield env.process(warehouse.deliver_order(order_id, deliver_time))
         deliver_service = env.now - deliver_start
-        print(f"[{env.now:.2f}] Order {order_id} delivered.")
+        emit(env.now, order_id, DELIVER, FINISHED)
 
     total_time = env.now - arrival_time
 
@@ -88,69 +192,179 @@ def order_process(env, order_id, warehouse, stats):
     stats['total_times'].append(total_time)
     stats['orders_completed'] += 1
 
-def generate_orders(env, warehouse, stats):
-    for i in range(NUM_ORDERS):
-        yield env.timeout(random.expovariate(1/6))  # Inter-arrival time
-        env.process(order_process(env, i, warehouse, stats))
-
-# Initialize statistics dict
-stats = {
-    'check_waits': [],
-    'check_services': [],
-    'cover_waits': [],
-    'cover_services': [],
-    'deliver_waits': [],
-    'deliver_services': [],
-    'total_times': [],
-    'orders_completed': 0,
-    'orders_cancelled': 0,
-}
-
-# Run simulation
-env = simpy.Environment()
-warehouse = Warehouse(env)
-env.process(generate_orders(env, warehouse, stats))
-env.run(until=SIM_TIME)
+def generate_orders(env, warehouse, stats, first=0):
+    config = warehouse.config
+    for i in range(first, config.num_orders):
+        yield env.timeout(warehouse.draw_interarrival())  # Inter-arrival time
+        basket = None
+        if warehouse.inventory is not None:
+            basket = random_basket(warehouse.basket_rng, warehouse.inventory, config.max_basket_lines)
+        env.process(order_process(env, i, warehouse, stats, basket))
+
+def replay_orders(env, warehouse, stats, arrivals):
+    # One order per (time, basket, services) record, e.g. from arrivals.read_orders;
+    # records are pulled one at a time as the simulation reaches them
+    config = warehouse.config
+    last = None
+    for i, (time, basket, services) in enumerate(arrivals):
+        if last is not None and time < last:
+            raise ValueError(f"arrival {i} at t={time} comes before the previous one at t={last}")
+        last = time
+        yield env.timeout(max(0.0, time - env.now))
+        if warehouse.inventory is not None and basket is None:
+            basket = random_basket(warehouse.basket_rng, warehouse.inventory, config.max_basket_lines)
+        env.process(order_process(env, i, warehouse, stats, basket, services))
+
+SERIES = ('check_waits', 'check_services', 'cover_waits', 'cover_services',
+          'deliver_waits', 'deliver_services', 'total_times')
+
+def new_stats(keep_samples=False):
+    # Streaming tallies keep memory flat; lists keep every sample for later analysis
+    stats = {name: [] if keep_samples else Tally() for name in SERIES}
+    stats['orders_completed'] = 0
+    stats['orders_cancelled'] = 0
+    return stats
+
+def run(config=SimConfig(), sink=None, trace=None, inventory=None, arrivals=None, variates=None):
+    """Run one simulation of `config` and return its SimResults.
+
+    `sink` receives the order events (see events.py) and `trace` is an optional
+    trace_store.TraceStore that gets one row per order. With an
+    inventory.Inventory, every order carries a random basket that the Check
+    stage reserves from stock instead of the `item_availability` coin flip.
+    `arrivals` replays recorded orders instead of generating `num_orders`
+    (see arrivals.read_orders); baskets and service times missing from the
+    records are drawn as usual. `variates` (a variates.Variates) replaces the
+    random.Random draws with block-sampled, pluggable distributions.
+    `config.metrics` and `config.profile` instrument the run (see profiling.py).
+    """
+    if config.metrics or config.profile != "off":
+        from profiling import profiled_run
+        return profiled_run(_run, config, sink, trace, inventory, arrivals, variates)
+    return _run(config, sink, trace, inventory, arrivals, variates)
+
+def _run(config, sink, trace, inventory, arrivals, variates, metrics=None):
+    if inventory is not None and config.engine == "numpy":
+        raise ValueError("inventory-driven availability needs the simpy or kernel engine")
+    if arrivals is not None and config.engine == "numpy":
+        raise ValueError("replaying recorded arrivals needs the simpy or kernel engine")
+    if variates is not None and config.engine == "numpy":
+        raise ValueError("block-sampled variates need the simpy or kernel engine")
+    if config.monitor and config.engine != "simpy":
+        raise ValueError("resource monitors need the simpy engine")
+    if config.engine == "numpy":
+        from vectorized import run_vectorized
+        stats = run_vectorized(config.num_orders, config.sim_time, *config.staffing,
+                               config.check_time_mean, config.cover_time_mean, config.deliver_time_mean,
+                               config.interarrival_mean, config.item_availability,
+                               seed=config.seed, antithetic=config.antithetic, trace=trace)
+        if not config.keep_samples:
+            for name in SERIES:
+                stats[name] = Tally.of(stats[name])
+        return SimResults(config, stats, trace)
+    if config.engine not in ENGINES:
+        raise ValueError(f"unknown engine {config.engine!r}")
+
+    if trace is not None:
+        sink = trace if sink is None else TeeSink(sink, trace)
+    stats = new_stats(config.keep_samples)
+    if config.engine == "kernel":
+        from event_kernel import run_kernel
+        run_kernel(config, stats, sink, inventory, arrivals, variates, metrics)
+        return SimResults(config, stats, trace)
+    env = simpy.Environment()
+    if metrics is not None:
+        # simpy keeps no public handle on its pending events
+        metrics.calendar = env._queue
+    warehouse = Warehouse(env, config, sink=sink, inventory=inventory, variates=variates)
+    monitors = None
+    if config.monitor:
+        from monitors import attach
+        horizon = config.sim_time
+        if horizon is None and arrivals is None:
+            horizon = config.num_orders * config.interarrival_mean
+        monitors = attach(warehouse, horizon=horizon)
+    if arrivals is None:
+        env.process(generate_orders(env, warehouse, stats))
+    else:
+        env.process(replay_orders(env, warehouse, stats, arrivals))
+    env.run(until=config.sim_time)
+    warehouse.sink.flush()
+    for monitor in (monitors or {}).values():
+        monitor.finish()
+    return SimResults(config, stats, trace, monitors)
 
 # Print summary stats
 def print_stats(name, data):
     if len(data) > 0:
-        print(f"{name}: mean={statistics.mean(data):.2f}, min={min(data):.2f}, max={max(data):.2f}")
+        data = as_tally(data)
+        print(f"{name}: mean={data.mean:.2f}, min={data.min:.2f}, max={data.max:.2f}, "
+              f"p50={data.quantile(0.5):.2f}, p95={data.quantile(0.95):.2f}, p99={data.quantile(0.99):.2f}")
     else:
         print(f"{name}: no data")
 
-print("\n--- Simulation Summary ---")
-print(f"Total orders completed: {stats['orders_completed']}")
-print(f"Total orders cancelled: {stats['orders_cancelled']}")
-print_stats("Check Wait Time", stats['check_waits'])
-print_stats("Check Service Time", stats['check_services'])
-print_stats("Cover Wait Time", stats['cover_waits'])
-print_stats("Cover Service Time", stats['cover_services'])
-print_stats("Deliver Wait Time", stats['deliver_waits'])
-print_stats("Deliver Service Time", stats['deliver_services'])
-print_stats("Total Time in System", stats['total_times'])
-
-# Plotting results
-fig, axs = plt.subplots(3, 3, figsize=(15, 12))
-fig.suptitle('Warehouse Order Processing Times')
-
-def plot_hist(data, ax, title):
-    ax.hist(data, bins=15, color='skyblue', edgecolor='black')
-    ax.set_title(title)
-    ax.set_xlabel('Time')
-    ax.set_ylabel('Frequency')
-
-plot_hist(stats['check_waits'], axs[0, 0], 'Check Wait Times')
-plot_hist(stats['check_services'], axs[0, 1], 'Check Service Times')
-axs[0, 2].axis('off')  # empty plot for symmetry
-
-plot_hist(stats['cover_waits'], axs[1, 0], 'Cover Wait Times')
-plot_hist(stats['cover_services'], axs[1, 1], 'Cover Service Times')
-axs[1, 2].axis('off')
-
-plot_hist(stats['deliver_waits'], axs[2, 0], 'Deliver Wait Times')
-plot_hist(stats['deliver_services'], axs[2, 1], 'Deliver Service Times')
-plot_hist(stats['total_times'], axs[2, 2], 'Total Time in System')
-
-plt.tight_layout(rect=[0, 0, 1, 0.96])
-plt.show()
+def print_summary(results):
+    stats = results.stats
+    print("\n--- Simulation Summary ---")
+    print(f"Total orders completed: {stats['orders_completed']}")
+    print(f"Total orders cancelled: {stats['orders_cancelled']}")
+    print_stats("Check Wait Time", stats['check_waits'])
+    print_stats("Check Service Time", stats['check_services'])
+    print_stats("Cover Wait Time", stats['cover_waits'])
+    print_stats("Cover Service Time", stats['cover_services'])
+    print_stats("Deliver Wait Time", stats['deliver_waits'])
+    print_stats("Deliver Service Time", stats['deliver_services'])
+    print_stats("Total Time in System", stats['total_times'])
+    for stage, monitor in (results.monitors or {}).items():
+        print(f"{stage.capitalize()} queue: mean={monitor.mean_queue:.2f}, max={monitor.max_queue}, "
+              f"utilization={monitor.utilization:.1%}")
+
+def parse_config(argv=None):
+    defaults = SimConfig()
+    parser = argparse.ArgumentParser(description="Simulate the Check -> Cover -> Deliver order pipeline.")
+    parser.add_argument("--staffing", type=int, nargs=3, metavar=("CHECK", "COVER", "DELIVER"),
+                        default=defaults.staffing)
+    parser.add_argument("--interarrival-mean", type=float, default=defaults.interarrival_mean)
+    parser.add_argument("--sim-time", type=float, default=defaults.sim_time,
+                        help="simulated horizon; 0 runs until every order is done")
+    parser.add_argument("--orders", type=int, default=defaults.num_orders)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--engine", choices=ENGINES, default=defaults.engine)
+    parser.add_argument("--arrivals", metavar="FILE",
+                        help="replay the orders of a CSV, NDJSON or .npy order file (see arrivals.py)")
+    parser.add_argument("--monitor", action="store_true",
+                        help="track queue lengths and utilization of each stage over time")
+    parser.add_argument("--metrics", action="store_true",
+                        help="report event counts, callback time, high-water marks and memory growth")
+    parser.add_argument("--profile", choices=["off", "cprofile", "tracemalloc"], default=defaults.profile,
+                        help="capture a cProfile listing or tracemalloc top allocations of the run")
+    parser.add_argument("--quiet", action="store_true", help="do not print the per-order event log")
+    parser.add_argument("--no-plot", action="store_true")
+    parser.add_argument("--report", metavar="FILE",
+                        help="write a PNG, SVG or HTML report to FILE instead of opening a plot window")
+    args = parser.parse_args(argv)
+    config = defaults.with_staffing(args.staffing).replace(
+        interarrival_mean=args.interarrival_mean, sim_time=args.sim_time or None,
+        num_orders=args.orders, seed=args.seed, engine=args.engine, monitor=args.monitor,
+        metrics=args.metrics, profile=args.profile)
+    return config, args
+
+if __name__ == "__main__":
+    config, args = parse_config()
+    arrivals = None
+    if args.arrivals:
+        from arrivals import read_orders
+        arrivals = read_orders(args.arrivals)
+    results = run(config, None if args.quiet else ConsoleSink(), arrivals=arrivals)
+    print_summary(results)
+    if results.metrics:
+        from profiling import print_metrics
+        print_metrics(results.metrics)
+
+    if args.report:
+        from report import write_report
+        write_report(results, args.report)
+    elif not args.no_plot:
+        # matplotlib is only imported when a plot is asked for
+        from plotting import plot_results
+        plot_results(results)
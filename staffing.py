@@ -0,0 +1,199 @@
+import argparse
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import analytic
+import simulation
+from replications import replication_seed
+
+STAGES = ('check', 'cover', 'deliver')
+
+
+def service_means(config):
+    return (config.check_time_mean, config.cover_time_mean, config.deliver_time_mean)
+
+
+def stage_loads(config=simulation.SimConfig()):
+    """Offered load (arrival rate x mean service) of each stage, in employees."""
+    return tuple(r * m for r, m in zip(analytic.stage_arrival_rates(config), service_means(config)))
+
+
+def candidate_levels(load, max_staff=200, beta=3.0):
+    """Staffing levels worth simulating for one stage.
+
+    Anything up to the load is unstable (utilization >= 1). Past
+    load + beta * sqrt(load) employees the stage practically never queues, so
+    more staff only adds cost and is dominated by the smaller level.
+    """
+    low = math.floor(load) + 1
+    high = min(max_staff, math.ceil(load + beta * math.sqrt(load)) + 1)
+    return range(max(low, 1), high + 1)
+
+
+def evaluate(staffing, config, metric, warmup_fraction, batches=20):
+    """(metric, standard error) of one plan; the error comes from batch means."""
+    results = simulation.run(config.with_staffing(staffing))
+    # Drop the orders that went through an empty warehouse
+    total_times = np.asarray(results.stats['total_times'])
+    total_times = total_times[int(len(total_times) * warmup_fraction):]
+    if len(total_times) == 0:
+        return math.inf, math.inf
+    statistic = np.mean if metric == "mean" else lambda values: np.percentile(values, 95)
+    value = float(statistic(total_times))
+    if len(total_times) < 2 * batches:
+        return value, math.inf
+    # Consecutive batches are close to independent, unlike consecutive orders
+    estimates = [statistic(batch) for batch in np.array_split(total_times, batches)]
+    return value, float(np.std(estimates, ddof=1) / math.sqrt(batches))
+
+
+def analytic_screen(candidates, config, stage_costs, penalty, slack):
+    """Candidates worth simulating, judged by the closed-form (Jackson network) mean time.
+
+    A plan is dropped when the analytic model shows it dominated on both axes:
+    a plan of the same staff cost is more than `slack` faster, or it is less
+    than `slack` faster than some cheaper plan, i.e. past the point where more
+    staff stops shortening the mean time. Plans within `slack` of the analytic
+    cost optimum are always kept.
+    """
+    rates = analytic.stage_arrival_rates(config)
+    # Stages are independent, so tabulate each stage's mean time once per level
+    tables = [{} for _ in STAGES]
+    for staffing in candidates:
+        for table, servers, r, mean in zip(tables, staffing, rates, service_means(config)):
+            if servers not in table:
+                table[servers] = analytic.station(r, mean, servers)['mean_time']
+    plans = [(staff_cost(s, stage_costs), sum(t[n] for t, n in zip(tables, s)), s) for s in candidates]
+    best = min((cost + penalty * time for cost, time, _ in plans), default=math.inf)
+
+    fastest = {}
+    for cost, time, _ in plans:
+        fastest[cost] = min(time, fastest.get(cost, math.inf))
+    # Fastest plan strictly cheaper than each staff cost
+    cheaper = {}
+    so_far = math.inf
+    for cost in sorted(fastest):
+        cheaper[cost] = so_far
+        so_far = min(so_far, fastest[cost])
+
+    kept = []
+    for cost, time, staffing in plans:
+        on_front = time <= fastest[cost] * (1 + slack) and time < cheaper[cost] * (1 - slack)
+        if on_front or cost + penalty * time <= best * (1 + slack):
+            kept.append(staffing)
+    return kept
+
+
+def staff_cost(staffing, stage_costs):
+    return sum(c * n for c, n in zip(stage_costs, staffing))
+
+
+def pareto_front(plans):
+    """Plans not beaten on both staff cost and the time metric by another plan."""
+    front = []
+    for plan in sorted(plans, key=lambda p: (p['staff_cost'], p['metric'])):
+        if not front or plan['metric'] < front[-1]['metric']:
+            front.append(plan)
+    return front
+
+
+def sweep(config=simulation.SimConfig(engine="numpy"), max_staff=200, stage_costs=(1, 1, 1),
+          penalty=10.0, metric="mean", rounds=(2000, 8000, 32000), keep=0.25,
+          workers=None, beta=3.0, warmup_fraction=0.1, analytic_slack=0.01, z=3.0):
+    """Search per-stage staffing levels for cost = staff cost + penalty * metric.
+
+    Rates, seed and engine come from `config`; its staffing, order count and
+    horizon are replaced by the search.
+    `metric` is "mean" or "p95" total time in system. Every candidate is first
+    simulated with `rounds[0]` orders; only the best `keep` fraction plus the
+    current Pareto front is re-simulated with the next, longer run. Within a
+    round every plan sees the same random draws, so they are compared fairly.
+    Other survivors are dropped early when even zero waiting could not bring
+    them within `z` standard errors of the best sampled cost.
+
+    For the mean metric, plans the analytic (Erlang C) model shows to be
+    dominated on both staff cost and mean time, up to `analytic_slack`, are
+    not simulated at all (see analytic_screen), so the Pareto front still
+    spans the whole trade-off; pass None to simulate the whole grid.
+    """
+    if metric not in ("mean", "p95"):
+        raise ValueError(f"unknown metric {metric!r}")
+
+    levels = [candidate_levels(load, max_staff, beta) for load in stage_loads(config)]
+    candidates = list(itertools.product(*levels))
+    considered = len(candidates)
+    if metric == "mean" and analytic_slack is not None:
+        candidates = analytic_screen(candidates, config, stage_costs, penalty, analytic_slack)
+    # No plan can do better than zero waiting at every stage
+    best_possible = sum(service_means(config))
+
+    plans = []
+    protected = set()
+    evaluated = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for round_index, num_orders in enumerate(rounds):
+            if plans:
+                # best_possible bounds the expected metric while the best cost is
+                # sampled, so leave room for its noise; the best plan and the
+                # front are what the others are compared against and always stay
+                best = plans[0]
+                threshold = best['cost'] + z * penalty * best['stderr']
+                candidates = [s for s in candidates if s in protected
+                              or staff_cost(s, stage_costs) + penalty * best_possible < threshold]
+            round_config = config.replace(num_orders=num_orders, sim_time=None, keep_samples=True,
+                                          seed=replication_seed(config.seed, round_index))
+            n = len(candidates)
+            chunksize = max(1, n // (4 * (workers or os.cpu_count() or 1)))
+            metrics = pool.map(evaluate, candidates, [round_config] * n, [metric] * n,
+                               [warmup_fraction] * n, chunksize=chunksize)
+            round_plans = []
+            for staffing, (value, stderr) in zip(candidates, metrics):
+                cost = staff_cost(staffing, stage_costs)
+                round_plans.append({'staffing': staffing, 'staff_cost': cost, 'metric': value,
+                                    'stderr': stderr, 'cost': cost + penalty * value})
+            evaluated += n
+            if not round_plans:
+                # Nothing left to refine; the previous round's plans stand
+                break
+            plans = sorted(round_plans, key=lambda p: p['cost'])
+
+            survivors = plans[:max(1, math.ceil(len(plans) * keep))]
+            front = pareto_front(plans)
+            survivors += [p for p in front if p not in survivors]
+            candidates = [p['staffing'] for p in survivors]
+            protected = {plans[0]['staffing']} | {p['staffing'] for p in front}
+
+    return {
+        'best': plans[0] if plans else None,
+        'pareto': pareto_front(plans),
+        'considered': considered,
+        'evaluated': evaluated,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search CHECK/COVER/DELIVER staffing levels.")
+    parser.add_argument("--interarrival-mean", type=float, default=simulation.INTERARRIVAL_MEAN)
+    parser.add_argument("--max-staff", type=int, default=200)
+    parser.add_argument("--stage-costs", type=float, nargs=3, default=(1, 1, 1))
+    parser.add_argument("--penalty", type=float, default=10.0)
+    parser.add_argument("--metric", choices=["mean", "p95"], default="mean")
+    parser.add_argument("--seed", type=int, default=simulation.RANDOM_SEED)
+    parser.add_argument("--engine", choices=["simpy", "numpy"], default="numpy")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    config = simulation.SimConfig(interarrival_mean=args.interarrival_mean, seed=args.seed, engine=args.engine)
+    result = sweep(config, args.max_staff, tuple(args.stage_costs), args.penalty, args.metric,
+                   workers=args.workers)
+    print(f"Considered {result['considered']} staffing plans, ran {result['evaluated']} simulations")
+    print("--- Pareto-optimal plans (check, cover, deliver) ---")
+    for plan in result['pareto']:
+        print(f"{plan['staffing']}: staff cost={plan['staff_cost']:.1f}, "
+              f"{args.metric} total time={plan['metric']:.2f}, cost={plan['cost']:.2f}")
+    if result['best']:
+        print(f"Best plan: {result['best']['staffing']} (cost={result['best']['cost']:.2f})")
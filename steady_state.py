@@ -0,0 +1,121 @@
+import argparse
+import math
+
+import numpy as np
+
+import simulation
+from replications import t_quantile
+
+SERIES = ('total_times', 'check_waits', 'cover_waits', 'deliver_waits')
+
+
+def mser(series, batch_size=5):
+    """Warm-up truncation point by MSER-`batch_size` (White's MSER-5 by default).
+
+    The series is averaged in batches of `batch_size`; the truncation that
+    minimizes the squared standard error of the remaining mean, searched over
+    the first half only, marks the end of the transient. Returns the number of
+    leading observations to drop.
+    """
+    series = np.asarray(series, dtype=float)
+    m = len(series) // batch_size
+    if m < 4:
+        return 0
+    batches = series[:m * batch_size].reshape(m, batch_size).mean(axis=1)
+    # Suffix sums give the mean and sum of squares of batches[d:] for every d at once
+    tail_sum = np.cumsum(batches[::-1])[::-1]
+    tail_sq = np.cumsum((batches ** 2)[::-1])[::-1]
+    remaining = np.arange(m, 0, -1)
+    statistic = (tail_sq - tail_sum ** 2 / remaining) / remaining ** 2
+    d = int(np.argmin(statistic[:m // 2]))
+    return d * batch_size
+
+
+def batch_means(series, batches=20, confidence=0.95):
+    """Mean and confidence interval of a stationary series from non-overlapping batch means.
+
+    Also reports the lag-1 autocorrelation of the batch means; values well above
+    zero mean the batches are too short and the interval is too optimistic.
+    """
+    series = np.asarray(series, dtype=float)
+    size = len(series) // batches
+    if size == 0:
+        return {'mean': float(series.mean()) if len(series) else math.nan,
+                'half_width': math.inf, 'batches': 0, 'batch_size': 0, 'lag1': math.nan}
+    means = series[:size * batches].reshape(batches, size).mean(axis=1)
+    grand = float(means.mean())
+    spread = float(means.std(ddof=1))
+    half_width = t_quantile(0.5 + confidence / 2, batches - 1) * spread / math.sqrt(batches)
+    centered = means - grand
+    denominator = float((centered ** 2).sum())
+    lag1 = float((centered[:-1] * centered[1:]).sum()) / denominator if denominator > 0 else math.nan
+    return {'mean': grand, 'half_width': half_width, 'low': grand - half_width, 'high': grand + half_width,
+            'batches': batches, 'batch_size': size, 'lag1': lag1}
+
+
+def series_from_trace(trace):
+    """Per-order series in arrival order from a TraceStore, completed orders only."""
+    columns = trace.view()
+    done = columns['outcome'] == 1
+    arrival = columns['arrival'][done]
+    return {
+        'total_times': columns['deliver_end'][done] - arrival,
+        'check_waits': columns['check_start'][done] - columns['check_enter'][done],
+        'cover_waits': columns['cover_start'][done] - columns['cover_enter'][done],
+        'deliver_waits': columns['deliver_start'][done] - columns['deliver_enter'][done],
+    }, arrival
+
+
+def analyze(series, batches=20, confidence=0.95, batch_size=5, times=None):
+    """Warm-up truncation and steady-state estimate for each named series.
+
+    `series` maps names to per-order samples in time order (a results object run
+    with keep_samples=True, or `series_from_trace`). When `times` gives each
+    sample's simulated time, the end of the warm-up is also reported as a time.
+    """
+    report = {}
+    for name, values in series.items():
+        values = np.asarray(values, dtype=float)
+        truncate = mser(values, batch_size)
+        estimate = batch_means(values[truncate:], batches, confidence)
+        estimate['truncated'] = truncate
+        estimate['observations'] = len(values) - truncate
+        if times is not None and truncate < len(times):
+            estimate['warmup_end'] = float(times[truncate])
+        report[name] = estimate
+    return report
+
+
+def required_observations(estimate, relative_half_width):
+    """Observations after warm-up needed to reach the target relative CI half-width.
+
+    Uses the usual 1/sqrt(n) scaling of the batch-means half-width.
+    """
+    target = relative_half_width * abs(estimate['mean'])
+    if target == 0 or not math.isfinite(estimate['half_width']):
+        return math.inf
+    return math.ceil(estimate['observations'] * (estimate['half_width'] / target) ** 2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Steady-state estimates from one long run.")
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--engine", choices=["simpy", "numpy"], default="numpy")
+    parser.add_argument("--seed", type=int, default=simulation.RANDOM_SEED)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--precision", type=float, default=0.01,
+                        help="target relative CI half-width used to size the run")
+    args = parser.parse_args()
+
+    from trace_store import TraceStore
+
+    trace = TraceStore()
+    config = simulation.SimConfig(num_orders=args.orders, sim_time=None, seed=args.seed, engine=args.engine)
+    simulation.run(config, trace=trace)
+    series, arrivals = series_from_trace(trace)
+    report = analyze(series, args.batches, times=arrivals)
+    for name, estimate in report.items():
+        needed = required_observations(estimate, args.precision)
+        print(f"{name}: mean={estimate['mean']:.3f} +/- {estimate['half_width']:.3f}, "
+              f"warm-up {estimate['truncated']} orders (until t={estimate.get('warmup_end', 0):.1f}), "
+              f"lag-1 r={estimate['lag1']:.2f}, ~{needed} orders for +/-{args.precision:.0%}")
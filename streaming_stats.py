@@ -0,0 +1,248 @@
+import math
+
+# NumPy is only needed for the bulk `extend` paths and is imported there, so
+# streaming a simpy run does not pay for importing it.
+
+
+class Histogram:
+    """Fixed number of equal-width bins starting at 0.
+
+    When a value lands past the last bin, neighbouring bins are merged in pairs
+    and the bin width doubles, so memory stays at `bins` counters whatever the
+    range of the data. Histograms with the same `bins` and initial `width` can
+    always be merged.
+    """
+
+    def __init__(self, bins=64, width=0.5):
+        if bins % 2:
+            raise ValueError("bins must be even")
+        self.counts = [0] * bins
+        self.width = width
+        self.underflow = 0
+
+    def _coarsen(self):
+        counts = self.counts
+        half = len(counts) // 2
+        self.counts = [counts[2 * i] + counts[2 * i + 1] for i in range(half)] + [0] * half
+        self.width *= 2
+
+    def _grow(self, value):
+        while value >= len(self.counts) * self.width:
+            self._coarsen()
+
+    def add(self, value):
+        if value < 0:
+            self.underflow += 1
+            return
+        if value >= len(self.counts) * self.width:
+            self._grow(value)
+        self.counts[int(value / self.width)] += 1
+
+    def extend(self, values):
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        negative = values < 0
+        self.underflow += int(np.count_nonzero(negative))
+        values = values[~negative]
+        if len(values) == 0:
+            return
+        self._grow(values.max())
+        # Guard against a value sitting exactly on the upper edge after rounding
+        index = np.minimum((values / self.width).astype(np.int64), len(self.counts) - 1)
+        added = np.bincount(index, minlength=len(self.counts))
+        self.counts = [c + int(a) for c, a in zip(self.counts, added)]
+
+    def merge(self, other):
+        if len(other.counts) != len(self.counts):
+            raise ValueError("cannot merge histograms with different bin counts")
+        # Bring both to the coarser width first
+        while self.width < other.width:
+            self._coarsen()
+        coarse = Histogram(len(other.counts), other.width)
+        coarse.counts = list(other.counts)
+        while coarse.width < self.width:
+            coarse._coarsen()
+        self.counts = [a + b for a, b in zip(self.counts, coarse.counts)]
+        self.underflow += other.underflow
+        return self
+
+    def edges(self):
+        return [i * self.width for i in range(len(self.counts) + 1)]
+
+
+class QuantileSketch:
+    """Mergeable log-bucketed quantile sketch (DDSketch style).
+
+    Quantile estimates are within `relative_accuracy` of the true value. At most
+    `max_buckets` buckets are kept; beyond that the lowest ones are collapsed,
+    which only affects the accuracy of the smallest quantiles.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048, min_value=1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        buckets = self.buckets
+        buckets[key] = buckets.get(key, 0) + 1
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def extend(self, values):
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        positive = values > self.min_value
+        self.zero_count += int(len(values) - np.count_nonzero(positive))
+        keys, counts = np.unique(np.ceil(np.log(values[positive]) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        buckets = self.buckets
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+        if len(buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        lowest = keys[excess]
+        for key in keys[:excess]:
+            self.buckets[lowest] += self.buckets.pop(key)
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class Tally:
+    """Constant-memory summary of a series of observations.
+
+    Keeps count, mean and variance (Welford), min/max, a histogram and a
+    quantile sketch. `append` mirrors `list.append` so it can stand in for the
+    per-order lists of `stats`, and tallies from separate runs can be merged.
+    """
+
+    def __init__(self, bins=64, width=0.5, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = math.nan
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.histogram = Histogram(bins, width)
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.histogram.add(value)
+        self.sketch.add(value)
+
+    def extend(self, values):
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        chunk = Tally.__new__(Tally)
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk._m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self._merge_moments(chunk)
+        self.histogram.extend(values)
+        self.sketch.extend(values)
+
+    def _merge_moments(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self._m2 += other._m2 + delta * delta * self.count * other.count / count
+            self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def merge(self, other):
+        self._merge_moments(other)
+        self.histogram.merge(other.histogram)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        # The sketch is only approximate; never report outside the observed range
+        return min(max(self.sketch.quantile(q), self.min), self.max)
+
+    @classmethod
+    def of(cls, values):
+        tally = cls()
+        tally.extend(values)
+        return tally
+
+
+def as_tally(data):
+    """`data` itself if it is already a Tally, otherwise a Tally of its values."""
+    return data if isinstance(data, Tally) else Tally.of(data)
@@ -0,0 +1,37 @@
+import random
+
+# Every source of randomness in the model
+SOURCES = ('arrival', 'check', 'cover', 'deliver', 'availability', 'basket')
+STREAM_MODES = ('shared', 'per_source')
+
+
+class AntitheticRandom(random.Random):
+    """Random whose uniforms are 1 - u of the plain stream with the same seed.
+
+    expovariate and the other inverse-transform draws build on random(), so
+    they come out as the antithetic counterparts too.
+    """
+
+    def random(self):
+        u = super().random()
+        # Keep the result in [0, 1) like random.random()
+        return 1.0 - u if u > 0.0 else 0.0
+
+
+def make_streams(seed, mode='shared', antithetic=False):
+    """Map each source in SOURCES to the random.Random it draws from.
+
+    "shared" is the original single stream for everything. "per_source" gives
+    every source its own stream, so runs of different scenarios with the same
+    seed see the same arrivals, service times and availability draws (common
+    random numbers) instead of drifting apart after the first difference.
+    """
+    kind = AntitheticRandom if antithetic else random.Random
+    if mode == 'shared':
+        return dict.fromkeys(SOURCES, kind(seed))
+    if mode == 'per_source':
+        if seed is None:
+            return {source: kind() for source in SOURCES}
+        # String seeds are hashed with SHA-512, so the streams are unrelated
+        return {source: kind(f"{seed}/{source}") for source in SOURCES}
+    raise ValueError(f"unknown stream mode {mode!r}, expected one of {STREAM_MODES}")
@@ -0,0 +1,108 @@
+import numpy as np
+
+from events import ARRIVED, CANCELLED, CHECK, COVER, DELIVER, FINISHED, KINDS, ORDER, STARTED, NullSink
+
+# Outcome codes
+IN_FLIGHT, COMPLETED, CANCELLED_OUTCOME = 0, 1, 2
+OUTCOMES = ('in_flight', 'completed', 'cancelled')
+
+TIME_COLUMNS = (
+    'arrival',
+    'check_enter', 'check_start', 'check_end',
+    'cover_enter', 'cover_start', 'cover_end',
+    'deliver_enter', 'deliver_start', 'deliver_end',
+)
+
+# Columns each event writes its time into; an order joins the next queue the
+# moment it leaves the previous stage
+_EVENT_COLUMNS = {
+    (ORDER, ARRIVED): ('arrival', 'check_enter'),
+    (CHECK, STARTED): ('check_start',),
+    (CHECK, FINISHED): ('check_end', 'cover_enter'),
+    (CHECK, CANCELLED): ('check_end',),
+    (COVER, STARTED): ('cover_start',),
+    (COVER, FINISHED): ('cover_end', 'deliver_enter'),
+    (DELIVER, STARTED): ('deliver_start',),
+    (DELIVER, FINISHED): ('deliver_end',),
+}
+
+
+class TraceStore(NullSink):
+    """Struct-of-arrays table with one row per order, indexed by order id.
+
+    Columns are preallocated NumPy arrays that double in size when an order id
+    runs past the end. Times an order has not reached yet are NaN. The store is
+    an event sink, so it records straight from `order_process`, cancelled
+    orders included.
+    """
+
+    level = 'trace'
+
+    def __init__(self, capacity=1024):
+        self.rows = 0
+        self._capacity = 0
+        self.columns = {name: np.empty(0) for name in TIME_COLUMNS}
+        self.columns['cancelled'] = np.empty(0, dtype=bool)
+        self.columns['outcome'] = np.empty(0, dtype=np.int8)
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        for name, column in self.columns.items():
+            fill = np.nan if column.dtype.kind == 'f' else 0
+            grown = np.full(capacity, fill, dtype=column.dtype)
+            grown[:self._capacity] = column
+            self.columns[name] = grown
+        self._capacity = capacity
+        # Refresh the per-event targets, which hold references to the arrays
+        self._targets = [()] * (len(KINDS) * 4)
+        for (stage, kind), names in _EVENT_COLUMNS.items():
+            self._targets[stage * len(KINDS) + kind] = tuple(self.columns[n] for n in names)
+        self._cancelled = self.columns['cancelled']
+        self._outcome = self.columns['outcome']
+
+    def emit(self, time, order_id, stage, kind):
+        if order_id >= self._capacity:
+            self._grow(max(2 * self._capacity, order_id + 1))
+        if order_id >= self.rows:
+            self.rows = order_id + 1
+        for column in self._targets[stage * len(KINDS) + kind]:
+            column[order_id] = time
+        if kind == CANCELLED:
+            self._cancelled[order_id] = True
+            self._outcome[order_id] = CANCELLED_OUTCOME
+        elif kind == FINISHED and stage == DELIVER:
+            self._outcome[order_id] = COMPLETED
+
+    def set_columns(self, **columns):
+        """Bulk-load whole columns, e.g. from the vectorized engine."""
+        rows = len(next(iter(columns.values())))
+        if rows > self._capacity:
+            self._grow(rows)
+        for name, values in columns.items():
+            self.columns[name][:rows] = values
+        self.rows = max(self.rows, rows)
+
+    def __len__(self):
+        return self.rows
+
+    def view(self):
+        """The used part of every column, without copying."""
+        return {name: column[:self.rows] for name, column in self.columns.items()}
+
+    def to_npz(self, path, compressed=False):
+        save = np.savez_compressed if compressed else np.savez
+        save(path, **self.view())
+
+    def to_parquet(self, path):
+        # pyarrow is only needed for Parquet export
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: pa.array(column) for name, column in self.view().items()})
+        pq.write_table(table, path)
+
+
+def load_npz(path):
+    """Columns of a `TraceStore.to_npz` file, ready for pandas.DataFrame or polars.DataFrame."""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
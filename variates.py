@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+
+from streams import SOURCES
+
+# Sources drawn from blocks; baskets keep their random.Random stream
+DRAWN = ('arrival', 'check', 'cover', 'deliver', 'availability')
+
+
+class Exponential:
+    def __init__(self, mean):
+        if mean <= 0:
+            raise ValueError("the mean must be positive")
+        self.mean = mean
+
+    def sample(self, rng, n):
+        return rng.exponential(self.mean, n)
+
+    @classmethod
+    def fit(cls, samples):
+        return cls(float(np.mean(samples)))
+
+    def __repr__(self):
+        return f"Exponential(mean={self.mean})"
+
+
+class LogNormal:
+    """Log-normal with the given mean; `sigma` is the standard deviation of the log."""
+
+    def __init__(self, mean, sigma):
+        if mean <= 0 or sigma < 0:
+            raise ValueError("need a positive mean and a non-negative sigma")
+        self.mean = mean
+        self.sigma = sigma
+        self.mu = math.log(mean) - sigma * sigma / 2
+
+    def sample(self, rng, n):
+        return rng.lognormal(self.mu, self.sigma, n)
+
+    @classmethod
+    def fit(cls, samples):
+        # Maximum likelihood: the moments of the log
+        logs = np.log(samples)
+        mu, sigma = float(logs.mean()), float(logs.std())
+        return cls(math.exp(mu + sigma * sigma / 2), sigma)
+
+    def __repr__(self):
+        return f"LogNormal(mean={self.mean}, sigma={self.sigma})"
+
+
+class Empirical:
+    """Observed values, interpolated between order statistics so draws are not limited to them."""
+
+    def __init__(self, values):
+        self.values = np.sort(np.asarray(values, dtype=float))
+        if len(self.values) == 0:
+            raise ValueError("need at least one observed value")
+        self.mean = float(self.values.mean())
+
+    def sample(self, rng, n):
+        positions = rng.random(n) * (len(self.values) - 1)
+        return np.interp(positions, np.arange(len(self.values)), self.values)
+
+    @classmethod
+    def fit(cls, samples):
+        return cls(samples)
+
+    def __repr__(self):
+        return f"Empirical({len(self.values)} values, mean={self.mean})"
+
+
+class Uniform:
+    """Uniforms in [0, 1), e.g. for the availability coin flip."""
+
+    mean = 0.5
+
+    def sample(self, rng, n):
+        return rng.random(n)
+
+    def __repr__(self):
+        return "Uniform()"
+
+
+DISTRIBUTIONS = {'exponential': Exponential, 'lognormal': LogNormal, 'empirical': Empirical}
+
+
+def fit(samples, family='lognormal'):
+    """Distribution of `family` (see DISTRIBUTIONS) fitted to positive observed durations."""
+    if family not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution {family!r}, expected one of {sorted(DISTRIBUTIONS)}")
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[np.isfinite(samples) & (samples > 0)]
+    if len(samples) == 0:
+        raise ValueError("no positive durations to fit")
+    return DISTRIBUTIONS[family].fit(samples)
+
+
+def fit_trace(columns, family='lognormal'):
+    """Interarrival and stage service distributions fitted to a recorded trace.
+
+    `columns` are trace_store columns, e.g. `TraceStore.view()` or `load_npz`.
+    """
+    return {
+        'arrival': fit(np.diff(np.sort(columns['arrival'])), family),
+        'check': fit(columns['check_end'] - columns['check_start'], family),
+        'cover': fit(columns['cover_end'] - columns['cover_start'], family),
+        'deliver': fit(columns['deliver_end'] - columns['deliver_start'], family),
+    }
+
+
+class BlockStream:
+    """Zero-argument draw of one distribution, sampled `block_size` values at a time."""
+
+    def __init__(self, distribution, rng, block_size=4096):
+        self.distribution = distribution
+        self.rng = rng
+        self.block_size = block_size
+        self._next = iter(()).__next__
+
+    def __call__(self):
+        try:
+            return self._next()
+        except StopIteration:
+            # tolist() hands out Python floats, which are cheaper to use than NumPy scalars
+            self._next = iter(self.distribution.sample(self.rng, self.block_size).tolist()).__next__
+            return self._next()
+
+
+class Variates:
+    """One block-sampled stream per source of randomness.
+
+    Every source gets its own NumPy Generator, spawned from `seed` in SOURCES
+    order, so the k-th check time is the same whatever happens in between:
+    draws do not depend on how events interleave, on the staffing or on the
+    block size. `distributions` maps sources in DRAWN to the distributions to
+    use; 'availability' is always Uniform.
+    """
+
+    def __init__(self, distributions, seed=None, block_size=4096):
+        unknown = set(distributions) - set(DRAWN)
+        if unknown:
+            raise ValueError(f"unknown sources {sorted(unknown)}, expected some of {DRAWN}")
+        missing = set(DRAWN) - set(distributions) - {'availability'}
+        if missing:
+            raise ValueError(f"no distribution for {sorted(missing)}")
+        self.distributions = dict(distributions, availability=Uniform())
+        children = np.random.SeedSequence(seed).spawn(len(SOURCES))
+        self.streams = {source: BlockStream(self.distributions[source], np.random.default_rng(child), block_size)
+                        for source, child in zip(SOURCES, children) if source in DRAWN}
+
+    @classmethod
+    def for_config(cls, config, distributions=None, block_size=4096):
+        """Exponential streams with the means of `config`, replaced by any given `distributions`."""
+        if config.antithetic:
+            raise ValueError("antithetic draws need the random.Random streams")
+        defaults = {
+            'arrival': Exponential(config.interarrival_mean),
+            'check': Exponential(config.check_time_mean),
+            'cover': Exponential(config.cover_time_mean),
+            'deliver': Exponential(config.deliver_time_mean),
+        }
+        return cls(dict(defaults, **(distributions or {})), config.seed, block_size)
+
+    def __getitem__(self, source):
+        return self.streams[source]
@@ -0,0 +1,158 @@
+import heapq
+
+import numpy as np
+
+from streams import SOURCES
+from trace_store import CANCELLED_OUTCOME, COMPLETED, IN_FLIGHT
+
+
+def fcfs_starts(arrivals, services, servers):
+    """Service start times at a FCFS station with `servers` identical employees.
+
+    `arrivals` must be sorted; `services` is aligned with it.
+    """
+    n = len(arrivals)
+    if n == 0:
+        return np.empty(0)
+    if servers >= n:
+        # Nobody ever waits
+        return arrivals.copy()
+    if servers == 1:
+        # Lindley recursion D_n = max(A_n, D_{n-1}) + S_n in closed form:
+        # D_n = C_n + max_{k<=n}(A_k - C_{k-1}) with C the cumulative service.
+        done_before = np.cumsum(services) - services
+        return np.maximum.accumulate(arrivals - done_before) + done_before
+
+    # Multi-server: each order takes the employee that frees up first
+    free_at = [0.0] * servers
+    starts = [0.0] * n
+    replace = heapq.heapreplace
+    for i, (arrive, service) in enumerate(zip(arrivals.tolist(), services.tolist())):
+        start = free_at[0]
+        if arrive > start:
+            start = arrive
+        replace(free_at, start + service)
+        starts[i] = start
+    return np.array(starts)
+
+
+def run_stage(arrivals, services, servers):
+    # Returns (waits, ends) aligned with the given arrival order
+    order = np.argsort(arrivals, kind="stable")
+    starts = np.empty_like(arrivals)
+    starts[order] = fcfs_starts(arrivals[order], services[order], servers)
+    return starts - arrivals, starts + services
+
+
+def source_uniforms(seed, n, antithetic=False):
+    # One child seed sequence per source of randomness
+    children = np.random.SeedSequence(seed).spawn(len(SOURCES))
+    uniforms = {}
+    for source, child in zip(SOURCES, children):
+        u = np.random.default_rng(child).random(n)
+        # Keep the antithetic draws in [0, 1) as well
+        uniforms[source] = np.where(u > 0.0, 1.0 - u, 0.0) if antithetic else u
+    return uniforms
+
+
+def fill_trace(trace, horizon, arrivals, check_starts, check_ends, available,
+               cover_starts, cover_ends, deliver_starts, deliver_ends):
+    # Cover/deliver arrays only cover the available orders
+    def spread(values):
+        column = np.full(len(arrivals), np.nan)
+        column[available] = values
+        return column
+
+    columns = {
+        'arrival': arrivals,
+        'check_enter': arrivals,
+        'check_start': check_starts,
+        'check_end': check_ends,
+        'cover_enter': spread(check_ends[available]),
+        'cover_start': spread(cover_starts),
+        'cover_end': spread(cover_ends),
+        'deliver_enter': spread(cover_ends),
+        'deliver_start': spread(deliver_starts),
+        'deliver_end': spread(deliver_ends),
+    }
+    # Nothing after the horizon has happened yet
+    for name, column in columns.items():
+        columns[name] = np.where(column <= horizon, column, np.nan)
+    cancelled = ~available & (check_ends <= horizon)
+    outcome = np.full(len(arrivals), IN_FLIGHT, dtype=np.int8)
+    outcome[cancelled] = CANCELLED_OUTCOME
+    outcome[~np.isnan(columns['deliver_end'])] = COMPLETED
+    trace.set_columns(cancelled=cancelled, outcome=outcome, **columns)
+
+
+def run_vectorized(num_orders, sim_time=None,
+                   check_employees=2, cover_employees=2, deliver_employees=2,
+                   check_mean=5, cover_mean=6, deliver_mean=5,
+                   interarrival_mean=6, availability=0.8, seed=None, antithetic=False, trace=None):
+    """Array-based equivalent of the simpy Check -> Cover -> Deliver model.
+
+    Returns a `stats` dict with the same keys as `simulation.py`; the series are
+    NumPy arrays of the orders finished by `sim_time`, in completion order.
+    When a `TraceStore` is given, it is filled with one row per arrived order.
+
+    Every source of randomness has its own stream, so runs with the same seed
+    and order count share their draws whatever the staffing (common random
+    numbers); `antithetic` flips every uniform u to 1 - u.
+    """
+    uniforms = source_uniforms(seed, num_orders, antithetic)
+    horizon = np.inf if sim_time is None else sim_time
+
+    # Pre-draw everything for every order up front, by inversion
+    arrivals = np.cumsum(-interarrival_mean * np.log1p(-uniforms['arrival']))
+    check_services = -check_mean * np.log1p(-uniforms['check'])
+    available = uniforms['availability'] < availability
+    cover_services = -cover_mean * np.log1p(-uniforms['cover'])
+    deliver_services = -deliver_mean * np.log1p(-uniforms['deliver'])
+
+    # Orders arriving after the horizon are never generated
+    arrived = arrivals <= horizon
+    arrivals = arrivals[arrived]
+    check_services = check_services[arrived]
+    available = available[arrived]
+    cover_services = cover_services[arrived]
+    deliver_services = deliver_services[arrived]
+
+    # Check Stage
+    check_waits, check_ends = run_stage(arrivals, check_services, check_employees)
+    orders_cancelled = int(np.count_nonzero(~available & (check_ends <= horizon)))
+    order_arrivals = arrivals
+    check_starts = arrivals + check_waits
+
+    # Only orders with every item available move on
+    arrivals = arrivals[available]
+    check_waits = check_waits[available]
+    check_services = check_services[available]
+    cover_services = cover_services[available]
+    deliver_services = deliver_services[available]
+
+    # Cover Stage
+    cover_waits, cover_ends = run_stage(check_ends[available], cover_services, cover_employees)
+
+    # Deliver Stage
+    deliver_waits, deliver_ends = run_stage(cover_ends, deliver_services, deliver_employees)
+
+    if trace is not None:
+        fill_trace(trace, horizon, order_arrivals, check_starts, check_ends, available,
+                   check_ends[available] + cover_waits, cover_ends,
+                   cover_ends + deliver_waits, deliver_ends)
+
+    # Keep what finished within the horizon, in completion order like the simpy run
+    finished = np.flatnonzero(deliver_ends <= horizon)
+    finished = finished[np.argsort(deliver_ends[finished], kind="stable")]
+
+    return {
+        'check_waits': check_waits[finished],
+        'check_services': check_services[finished],
+        'cover_waits': cover_waits[finished],
+        'cover_services': cover_services[finished],
+        'deliver_waits': deliver_waits[finished],
+        'deliver_services': deliver_services[finished],
+        'total_times': deliver_ends[finished] - arrivals[finished],
+        'orders_completed': len(finished),
+        'orders_cancelled': orders_cancelled,
+    }